@@ -0,0 +1,12 @@
+import os
+from a2wsgi import WSGIMiddleware
+from dotenv import load_dotenv
+from run import app as flask_app
+
+load_dotenv()
+
+# Each in-flight request occupies one pool thread while it waits on LLM,
+# scraping or database I/O, so this bounds concurrency per uvicorn worker.
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 256))
+
+app = WSGIMiddleware(flask_app, workers=ASGI_THREADS)
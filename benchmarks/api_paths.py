@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+import numpy as np
+
+PATHS = ["list", "search", "semantic_search", "insights", "compare", "autofill"]
+SEARCH_TERMS = ["llama", "gemma", "7b", "qwen", "phi-3", "70b", "bert", "mistral"]
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(values.mean()), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def install_fakes(args):
+    # Swap every network dependency for a deterministic local fake.
+    from benchmarks import fakes
+    import routes.model_routes as model_routes
+    import services.agent_service as agent_service
+    import services.llm_router as llm_router
+
+    router = llm_router.get_router()
+    router.providers["gemini"].client = fakes.FakeGenaiClient(args.genai_latency)
+    model_routes.semantic_search_service.client = fakes.FakeGenaiClient(
+        args.genai_latency
+    )
+    llm_router.ChatGroq = fakes.fake_groq_factory(args.groq_latency)
+    agent_service.ChatGroq = fakes.fake_groq_factory(args.groq_latency)
+    agent_service.requests = fakes.FakeHttp(args.http_latency)
+    agent_service._embeddings = fakes.FakeEmbeddings(args.embedding_latency)
+
+
+def build_requests(args, user_ids: List[int], model_ids: List[int]) -> Dict:
+    import jwt
+    from routes.auth_routes import SECRET_KEY
+
+    token = jwt.encode(
+        {
+            "user_id": user_ids[0],
+            "exp": datetime.now(timezone.utc) + timedelta(hours=12),
+        },
+        SECRET_KEY,
+        algorithm="HS256",
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    prefix = "/api/v1/models"
+
+    # Each builder maps a seeded RNG to one request for the Flask test client.
+    return {
+        "list": lambda rng: ("GET", f"{prefix}/", {"headers": headers}),
+        "search": lambda rng: (
+            "GET",
+            f"{prefix}/search",
+            {"headers": headers, "query_string": {"q": rng.choice(SEARCH_TERMS)}},
+        ),
+        "semantic_search": lambda rng: (
+            "GET",
+            f"{prefix}/semantic-search",
+            {"query_string": {"q": f"{rng.choice(SEARCH_TERMS)} for rag"}},
+        ),
+        "insights": lambda rng: (
+            "GET",
+            f"{prefix}/{rng.choice(model_ids)}/insights",
+            {},
+        ),
+        "compare": lambda rng: (
+            "POST",
+            f"{prefix}/insights/compare",
+            {"headers": headers, "json": {"model_ids": rng.sample(model_ids, 3)}},
+        ),
+        "autofill": lambda rng: (
+            "POST",
+            f"{prefix}/autofill",
+            {
+                "headers": headers,
+                "data": {
+                    "model_id": f"bench/model-{rng.randrange(10**6)}",
+                    "model_links": [
+                        f"https://example.com/docs/{rng.randrange(10**6)}"
+                        for _ in range(3)
+                    ],
+                    "retrieval_profile": args.retrieval_profile,
+                    # Measure the pipeline, not a stored run.
+                    "force_refresh": "true",
+                },
+            },
+        ),
+    }
+
+
+def run_path(app, build_request: Callable, args, seed: int) -> Dict:
+    rng = random.Random(seed)
+    planned = [build_request(rng) for _ in range(args.warmup + args.requests)]
+    client = app.test_client()
+
+    def send(planned_request):
+        method, url, kwargs = planned_request
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        return time.perf_counter() - start, response.status_code
+
+    for planned_request in planned[: args.warmup]:
+        send(planned_request)
+
+    latencies, errors = [], 0
+    deadline = time.monotonic() + args.max_seconds_per_path
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for latency, status_code in executor.map(
+            lambda planned_request: (
+                send(planned_request) if time.monotonic() < deadline else (None, None)
+            ),
+            planned[args.warmup :],
+        ):
+            if latency is None:
+                continue
+            latencies.append(latency)
+            errors += status_code >= 400
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark API paths against a seeded catalog with fake providers"
+    )
+    parser.add_argument(
+        "--database-url",
+        required=True,
+        help="a throwaway PostgreSQL database; its tables are dropped and reseeded",
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--paths", default=",".join(PATHS))
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--max-seconds-per-path",
+        type=float,
+        default=120,
+        help="stop sending a path's requests after this long",
+    )
+    parser.add_argument("--genai-latency", type=float, default=0.05)
+    parser.add_argument("--groq-latency", type=float, default=0.2)
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--embedding-latency", type=float, default=0.001)
+    parser.add_argument(
+        "--retrieval-profile", default="balanced", help="for the autofill path"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    # Configure the app before anything imports models.models or the routes.
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-for-local-runs-only")
+    os.environ.setdefault("USER_AGENT", "TrackML-benchmark")
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("LOG_CONSOLE_LEVEL", "WARNING")
+    os.environ.setdefault("COMPRESSION_ENABLED", "false")
+
+    from benchmarks.catalog import seed_catalog
+    from models.models import ModelEntry, engine, session
+    from run import app
+
+    install_fakes(args)
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown paths: {', '.join(sorted(unknown))}")
+
+    results = []
+    for rows in [int(size) for size in args.sizes.split(",")]:
+        seed_start = time.perf_counter()
+        user_ids = seed_catalog(engine, rows, args.users, args.seed)
+        seed_seconds = time.perf_counter() - seed_start
+        model_ids = [
+            model_id
+            for (model_id,) in session.query(ModelEntry.id).filter_by(
+                user_id=user_ids[0]
+            )
+        ]
+        session.remove()
+        print(
+            f"Seeded {rows} models for {args.users} users in {seed_seconds:.1f}s",
+            file=sys.stderr,
+        )
+
+        builders = build_requests(args, user_ids, model_ids)
+        for path in paths:
+            result = run_path(app, builders[path], args, args.seed)
+            results.append({"rows": rows, "path": path, **result})
+            print(
+                f"{rows:>7} {path:<16} p50={result['latency_ms'].get('p50')}ms "
+                f"p95={result['latency_ms'].get('p95')}ms "
+                f"rps={result['throughput_rps']}",
+                file=sys.stderr,
+            )
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            key: value for key, value in vars(args).items() if key != "database_url"
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import random
+from datetime import date, timedelta
+from typing import List
+from sqlalchemy.engine import Engine
+from werkzeug.security import generate_password_hash
+from models.migrations import apply_schema_upgrades
+from models.models import Base, ModelEntry, User
+
+DEVELOPERS = ["Meta", "Google", "Mistral AI", "Alibaba", "Microsoft", "OpenAI", "TII"]
+MODEL_FAMILIES = ["llama", "gemma", "mistral", "qwen", "phi", "falcon", "bert", "t5"]
+MODEL_TYPES = ["LLM", "Embedding", "Vision", "Speech", "Multimodal"]
+STATUSES = ["Using", "Testing", "Archived", "Planned"]
+LICENSES = ["MIT", "Apache-2.0", "Llama 3", "CC-BY-4.0", "Proprietary"]
+TAGS = [
+    "nlp",
+    "chat",
+    "code",
+    "rag",
+    "quantized",
+    "instruct",
+    "multilingual",
+    "vision",
+    "edge",
+    "long-context",
+]
+INSERT_BATCH_SIZE = 5000
+
+
+def _model_row(rng: random.Random, index: int, user_id: int) -> dict:
+    family = rng.choice(MODEL_FAMILIES)
+    size = rng.choice([1, 3, 7, 8, 13, 34, 70])
+    return {
+        "name": f"{family}-{size}b-{index}",
+        "developer": rng.choice(DEVELOPERS),
+        "model_type": rng.choice(MODEL_TYPES),
+        "status": rng.choice(STATUSES),
+        "date_interacted": date(2024, 1, 1) + timedelta(days=rng.randrange(600)),
+        "tags": rng.sample(TAGS, rng.randint(1, 4)),
+        "notes": (
+            f"{family} {size}B evaluated for {rng.choice(TAGS)} workloads; "
+            f"latency {rng.randint(20, 900)} ms per request on the test rig."
+        ),
+        "source_links": [f"https://example.com/{family}/{index}"],
+        "parameters": size,
+        "license": rng.choice(LICENSES),
+        "version": f"{rng.randint(1, 4)}.{rng.randint(0, 9)}",
+        "user_id": user_id,
+    }
+
+
+def seed_catalog(engine: Engine, rows: int, users: int, seed: int) -> List[int]:
+    # Recreates every table: only point this at a throwaway database.
+    rng = random.Random(seed)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    apply_schema_upgrades(engine)
+
+    password_hash = generate_password_hash("benchmark")
+    with engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "username": f"bench-user-{i}",
+                    "email": f"bench-user-{i}@example.com",
+                    "password_hash": password_hash,
+                }
+                for i in range(users)
+            ],
+        )
+        user_ids = [
+            row.id
+            for row in connection.execute(
+                User.__table__.select().order_by(User.__table__.c.id)
+            )
+        ]
+        for start in range(0, rows, INSERT_BATCH_SIZE):
+            connection.execute(
+                ModelEntry.__table__.insert(),
+                [
+                    _model_row(rng, index, user_ids[index % users])
+                    for index in range(start, min(start + INSERT_BATCH_SIZE, rows))
+                ],
+            )
+    return user_ids
@@ -0,0 +1,156 @@
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from services.embedding_backends import OnnxEmbeddings, create_embeddings
+
+SYNTHETIC_TOPICS = [
+    "transformer decoder with grouped query attention",
+    "mixture of experts routing with top-2 gating",
+    "rotary position embeddings extended to long contexts",
+    "int4 weight-only quantization for edge inference",
+    "instruction tuning on multilingual conversations",
+    "vision encoder aligned to a language model",
+    "speculative decoding with a draft model",
+    "retrieval augmented generation over technical manuals",
+]
+
+
+def load_chunks(corpus_path: str, chunk_count: int, seed: int) -> List[str]:
+    if corpus_path:
+        if corpus_path.lower().endswith(".pdf"):
+            from pypdf import PdfReader
+
+            text = "\n".join(
+                page.extract_text() or "" for page in PdfReader(corpus_path).pages
+            )
+        else:
+            with open(corpus_path, encoding="utf-8") as f:
+                text = f.read()
+    else:
+        rng = random.Random(seed)
+        sentences = [
+            f"The model uses {rng.choice(SYNTHETIC_TOPICS)} and reaches "
+            f"{rng.randint(40, 95)}% on benchmark {rng.randint(1, 50)} with "
+            f"{rng.choice([1, 3, 7, 8, 13, 70])}B parameters."
+            for _ in range(chunk_count * 4)
+        ]
+        text = " ".join(sentences)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    return splitter.split_text(text)[:chunk_count]
+
+
+def make_queries(chunks: List[str], query_count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    sample = rng.sample(chunks, min(query_count, len(chunks)))
+    return [" ".join(chunk.split()[:12]) for chunk in sample]
+
+
+def build_backend(name: str, onnx_path: str, threads: int, batch_size: int):
+    if name == "torch":
+        return create_embeddings("torch")
+    if name in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(
+            model_dir=onnx_path,
+            quantized=name == "onnx-int8",
+            batch_size=batch_size,
+            num_threads=threads,
+        )
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def top_k(query_vectors: np.ndarray, doc_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_backend(backend, chunks: List[str], queries: List[str]) -> Dict:
+    backend.embed_documents(chunks[:8])  # warm up
+    start = time.perf_counter()
+    doc_vectors = np.asarray(backend.embed_documents(chunks), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    query_vectors = np.asarray(
+        [backend.embed_query(query) for query in queries], dtype=np.float32
+    )
+    return {
+        "seconds": elapsed,
+        "chunks_per_second": len(chunks) / elapsed if elapsed else None,
+        "doc_vectors": doc_vectors,
+        "query_vectors": query_vectors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare embedding backends on throughput and retrieval parity"
+    )
+    parser.add_argument("--corpus", help="PDF or text file; synthetic text if omitted")
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--reference", default="torch")
+    parser.add_argument("--onnx-path", default=None)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    from services import embedding_backends
+
+    onnx_path = args.onnx_path or embedding_backends.EMBEDDING_ONNX_PATH
+    threads = args.threads or embedding_backends.EMBEDDING_THREADS
+
+    chunks = load_chunks(args.corpus, args.chunks, args.seed)
+    queries = make_queries(chunks, args.queries, args.seed)
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+    if args.reference not in names:
+        names.insert(0, args.reference)
+
+    runs = {}
+    for name in names:
+        backend = build_backend(name, onnx_path, threads, args.batch_size)
+        runs[name] = run_backend(backend, chunks, queries)
+
+    reference = runs[args.reference]
+    reference_top_k = top_k(
+        reference["query_vectors"], reference["doc_vectors"], args.k
+    )
+    report = {
+        "chunks": len(chunks),
+        "queries": len(queries),
+        "k": args.k,
+        "threads": threads,
+        "reference": args.reference,
+        "backends": {},
+    }
+    for name, run in runs.items():
+        cosines = np.sum(run["doc_vectors"] * reference["doc_vectors"], axis=1)
+        backend_top_k = top_k(run["query_vectors"], run["doc_vectors"], args.k)
+        overlaps = [
+            len(set(expected) & set(actual)) / args.k
+            for expected, actual in zip(reference_top_k, backend_top_k)
+        ]
+        report["backends"][name] = {
+            "seconds": round(run["seconds"], 3),
+            "chunks_per_second": round(run["chunks_per_second"], 2),
+            "speedup_vs_reference": round(reference["seconds"] / run["seconds"], 2),
+            "mean_cosine_to_reference": round(float(np.mean(cosines)), 5),
+            "min_cosine_to_reference": round(float(np.min(cosines)), 5),
+            f"recall_at_{args.k}_vs_reference": round(float(np.mean(overlaps)), 4),
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+import time
+from types import SimpleNamespace
+from typing import List, Union
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+
+def hashed_vector(text: str, size: int) -> List[float]:
+    # Deterministic per text, so runs against the same catalog are comparable.
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(size)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeGenaiModels:
+    def __init__(self, latency: float, embedding_size: int = 768):
+        self.latency = latency
+        self.embedding_size = embedding_size
+
+    def generate_content(self, model: str, contents: str):
+        time.sleep(self.latency)
+        digest = hashlib.sha256(contents.encode("utf-8")).hexdigest()[:12]
+        return SimpleNamespace(
+            text=f"Synthetic {model} analysis {digest} for a {len(contents)} character prompt."
+        )
+
+    def embed_content(self, model: str, contents: Union[str, List[str]]):
+        time.sleep(self.latency)
+        texts = [contents] if isinstance(contents, str) else contents
+        return SimpleNamespace(
+            embeddings=[
+                SimpleNamespace(values=hashed_vector(text, self.embedding_size))
+                for text in texts
+            ]
+        )
+
+
+class FakeGenaiClient:
+    # Stands in for google.genai.Client in ModelInsightsService and
+    # SemanticSearchService.
+    def __init__(self, latency: float):
+        self.models = FakeGenaiModels(latency)
+
+
+class FakeGroqChat(FakeListChatModel):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs) -> str:
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+def fake_groq_factory(latency: float):
+    def create(**kwargs) -> FakeGroqChat:
+        return FakeGroqChat(
+            latency=latency,
+            responses=[
+                "What is the architecture of this model?\n"
+                "Which tasks is this model used for?\n"
+                "What hardware does this model need?",
+                "Synthetic summary of the model's architecture, use cases, "
+                "performance and limitations.",
+            ],
+        )
+
+    return create
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, latency_per_chunk: float, size: int = 384):
+        self.latency_per_chunk = latency_per_chunk
+        self.size = size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_per_chunk * len(texts))
+        return [hashed_vector(text, self.size) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeHttp:
+    # Replaces the requests module in services.agent_service.
+    def __init__(self, latency: float, paragraphs: int = 40):
+        self.latency = latency
+        self.paragraphs = paragraphs
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        time.sleep(self.latency)
+        rng = np.random.default_rng(
+            int.from_bytes(hashlib.sha256(url.encode("utf-8")).digest()[:8], "big")
+        )
+        body = "".join(
+            f"<p>Section {i}: the model has {rng.integers(1, 80)}B parameters, "
+            f"a context window of {rng.integers(2, 256)}k tokens and scores "
+            f"{rng.integers(40, 95)}% on benchmark {rng.integers(1, 30)}.</p>"
+            for i in range(self.paragraphs)
+        )
+        return FakeResponse(
+            f"<html><body><nav>Home | Docs | Pricing</nav><main>{body}</main>"
+            "<footer>Copyright</footer></body></html>"
+        )
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+from utils.vectors import VECTOR_RESCORE_FACTOR, VectorIndex, quantize_int8
+
+
+def make_vectors(count: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    # Clustered unit vectors, so near neighbours are close calls like they
+    # are for real model descriptions.
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal(
+        (count, dimensions)
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    sample = vectors[rng.choice(len(vectors), count, replace=False)]
+    queries = sample + 0.3 * rng.standard_normal(sample.shape) / np.sqrt(
+        vectors.shape[1]
+    )
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def measure(build: Callable):
+    # Bytes allocated by build() that are still held afterwards.
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return built, held
+
+
+def mapped(directory: str, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+    codes, scales = quantize_int8(vectors)
+    arrays = {"vectors": vectors, "codes": codes, "scales": scales}
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    return {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        for name in arrays
+    }
+
+
+def run(
+    search: Callable[[np.ndarray], List[int]], queries: np.ndarray, exact: List[set]
+) -> Dict:
+    search(queries[0])  # warm up
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    elapsed = time.perf_counter() - start
+    recalls = [
+        len(expected & set(result)) / len(expected)
+        for expected, result in zip(exact, results)
+    ]
+    return {
+        "mean_query_ms": round(elapsed / len(queries) * 1000, 3),
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "min_recall_at_k": round(float(np.min(recalls)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare embedding representations on memory and search recall"
+    )
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=VECTOR_RESCORE_FACTOR)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dimensions, args.clusters, args.seed)
+    queries = make_queries(vectors, args.queries, args.seed)
+    ids = np.arange(len(vectors))
+    exact = [set(np.argsort(-(vectors @ query))[: args.k]) for query in queries]
+    vectors32 = vectors.astype(np.float32)
+
+    def top(scores: np.ndarray) -> List[int]:
+        return list(np.argsort(-scores)[: args.k])
+
+    report = {
+        "vectors": args.vectors,
+        "dimensions": args.dimensions,
+        "queries": args.queries,
+        "k": args.k,
+        "rescore_factor": args.rescore_factor,
+        "representations": {},
+    }
+    results = report["representations"]
+
+    def search_with(index: VectorIndex, rescore_factor: int):
+        return lambda query: [i for i, _ in index.search(query, args.k, rescore_factor)]
+
+    # What the services held before: embeddings as Python float lists, turned
+    # into an array on every search (slow, so timed on a few queries only).
+    lists, held = measure(lambda: vectors.tolist())
+    sample = slice(0, min(len(queries), 10))
+    results["python-lists"] = {
+        "resident_bytes": held,
+        **run(
+            lambda query: top(np.asarray(lists) @ query),
+            queries[sample],
+            exact[sample],
+        ),
+    }
+    lists = None
+
+    in_memory = {
+        "float32": ("float32", 0),
+        "int8": ("int8", 0),
+        "int8-rescored": ("int8", args.rescore_factor),
+    }
+    for name, (representation, rescore_factor) in in_memory.items():
+        index, held = measure(
+            lambda: VectorIndex(
+                ids.copy(),
+                vectors32.copy(),
+                representation,
+                fetch=lambda positions: vectors32[positions],
+            )
+        )
+        results[name] = {
+            "resident_bytes": held,
+            **run(search_with(index, rescore_factor), queries, exact),
+        }
+
+    with tempfile.TemporaryDirectory() as directory:
+        arrays = mapped(directory, vectors32)
+        for name, representation in (
+            ("float32-mmap", "float32"),
+            ("int8-mmap-rescored", "int8"),
+        ):
+            index = VectorIndex(
+                ids,
+                arrays["vectors"],
+                representation,
+                codes=arrays["codes"] if representation == "int8" else None,
+                scales=arrays["scales"] if representation == "int8" else None,
+            )
+            mapped_bytes = arrays["vectors"].nbytes
+            if representation == "int8":
+                mapped_bytes += arrays["codes"].nbytes + arrays["scales"].nbytes
+            results[name] = {
+                "resident_bytes": index.nbytes,
+                "mapped_bytes_shared_by_workers": mapped_bytes,
+                **run(search_with(index, args.rescore_factor), queries, exact),
+            }
+        index = arrays = None
+
+    for result in results.values():
+        result["resident_bytes_per_vector"] = round(
+            result["resident_bytes"] / args.vectors, 1
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,25 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "dev-secret-key"
+    CATALOG_CACHE_CONTROL = "private, no-cache"
+    INSIGHTS_CACHE_MAX_AGE = int(os.environ.get("INSIGHTS_CACHE_MAX_AGE") or 300)
+    COMPRESSION_ENABLED = (
+        os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+    )
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE") or 1024)
+    GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL") or 6)
+    BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY") or 5)
+    # Flask rejects larger request bodies with 413 before they are parsed.
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_UPLOAD_MB") or 50) * 1024 * 1024
+    UPLOAD_SPOOL_MAX_MEMORY = int(
+        os.environ.get("UPLOAD_SPOOL_MAX_MEMORY") or 1024 * 1024
+    )
+    # Request profiling; see utils/profiling.py. Off unless explicitly enabled.
+    PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+    PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE") or 0)
+    PROFILING_REPORT_DIR = os.environ.get("PROFILING_REPORT_DIR") or os.path.join(
+        basedir, "profiles"
+    )
+    PROFILING_MAX_REPORTS = int(os.environ.get("PROFILING_MAX_REPORTS") or 50)
+    PROFILING_TOP_FUNCTIONS = int(os.environ.get("PROFILING_TOP_FUNCTIONS") or 40)
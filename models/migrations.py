@@ -0,0 +1,24 @@
+from sqlalchemy import text
+
+# create_all only creates missing tables, so columns added to existing tables
+# are applied here. Every statement must be idempotent.
+SCHEMA_UPGRADES = [
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS catalog_version INTEGER NOT NULL DEFAULT 0",
+    "CREATE SEQUENCE IF NOT EXISTS model_change_seq",
+    "ALTER TABLE model_entry ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP "
+    "DEFAULT (now() AT TIME ZONE 'utc')",
+    # Existing rows each draw a stamp, so a first sync with since=0 sees them.
+    "ALTER TABLE model_entry ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL "
+    "DEFAULT nextval('model_change_seq')",
+    "CREATE INDEX IF NOT EXISTS ix_model_entry_user_change_seq "
+    "ON model_entry (user_id, change_seq)",
+    "CREATE SEQUENCE IF NOT EXISTS model_embedding_seq",
+    "ALTER TABLE model_embeddings ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL "
+    "DEFAULT nextval('model_embedding_seq')",
+]
+
+
+def apply_schema_upgrades(engine):
+    with engine.begin() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
@@ -3,29 +3,48 @@ from sqlalchemy import (
     create_engine,
     Column,
     Integer,
+    BigInteger,
+    Sequence,
+    Index,
     String,
     Date,
+    DateTime,
     ARRAY,
     Text,
     Boolean,
+    Float,
     ForeignKey,
+    LargeBinary,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship
 from werkzeug.security import generate_password_hash, check_password_hash
+from models.migrations import apply_schema_upgrades
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+engine = create_engine(
+    DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW
+)
 Session = sessionmaker(bind=engine)
-session = Session()
+# One session per thread; run.py removes it when each request's app context ends.
+session = scoped_session(Session)
 
 Base = declarative_base()
 
+# Stamps every model insert, update and deletion for GET /models/changes.
+# Writes bump the owner's catalog_version first, so the user row lock orders
+# one user's stamps by commit and a client cursor never skips a late commit.
+model_change_seq = Sequence("model_change_seq", metadata=Base.metadata)
+# Stamps every embedding write, so vector indexes can tell when to reload.
+model_embedding_seq = Sequence("model_embedding_seq", metadata=Base.metadata)
+
 
 class ModelEntry(Base):
     __tablename__ = "model_entry"
@@ -43,8 +62,18 @@ class ModelEntry(Base):
     license = Column(String(50), nullable=True)
     version = Column(String(50), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(
+        BigInteger,
+        model_change_seq,
+        server_default=model_change_seq.next_value(),
+        onupdate=model_change_seq.next_value(),
+        nullable=False,
+    )
     user = relationship("User", back_populates="models")
 
+    __table_args__ = (Index("ix_model_entry_user_change_seq", "user_id", "change_seq"),)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -63,9 +92,121 @@ class ModelEntry(Base):
             "version": self.version,
             "user_id": self.user_id,
             "username": self.user.username if self.user else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
+class ModelTombstone(Base):
+    # Left behind by deleted models so change feeds can report the deletion.
+    __tablename__ = "model_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    change_seq = Column(
+        BigInteger,
+        model_change_seq,
+        server_default=model_change_seq.next_value(),
+        nullable=False,
+    )
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_model_tombstones_user_change_seq", "user_id", "change_seq"),
+    )
+
+
+class ModelEmbedding(Base):
+    # One embedding per model, recomputed when the embedded text changes.
+    __tablename__ = "model_embeddings"
+
+    model_id = Column(
+        Integer, ForeignKey("model_entry.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    text_hash = Column(String(64), nullable=False)
+    # L2-normalised float32 bytes, so a dot product is the cosine similarity.
+    vector = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(
+        BigInteger,
+        model_embedding_seq,
+        server_default=model_embedding_seq.next_value(),
+        nullable=False,
+    )
+
+
+class ModelNeighbor(Base):
+    # The precomputed k-nearest-neighbour graph within each user's catalog.
+    __tablename__ = "model_neighbors"
+
+    model_id = Column(
+        Integer, ForeignKey("model_entry.id", ondelete="CASCADE"), primary_key=True
+    )
+    neighbor_id = Column(
+        Integer,
+        ForeignKey("model_entry.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    similarity = Column(Float, nullable=False)
+
+
+class ModelInsight(Base):
+    # Generated insights keyed by ModelInsightsService.content_hash, so a
+    # model's insights are a lookup until its content or the prompts change.
+    __tablename__ = "model_insights"
+
+    content_hash = Column(String(64), primary_key=True)
+    sections = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AutofillRun(Base):
+    # One completed autofill per row. fingerprint identifies its inputs (see
+    # services.autofill_run_service), so a repeated request is a lookup.
+    __tablename__ = "autofill_runs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    model_id = Column(String(255), nullable=False)
+    links = Column(ARRAY(String), nullable=False, default=list)
+    file_hashes = Column(ARRAY(String), nullable=False, default=list)
+    file_names = Column(ARRAY(String), nullable=False, default=list)
+    retrieval_profile = Column(String(20), nullable=False)
+    pipeline_version = Column(String(255), nullable=False)
+    response = Column(Text, nullable=False)
+    stats = Column(JSONB, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_autofill_runs_user_fingerprint", "user_id", "fingerprint", "id"),
+        Index("ix_autofill_runs_user_model", "user_id", "model_id", "id"),
+    )
+
+    def to_dict(self, include_response: bool = True):
+        data = {
+            "run_id": self.id,
+            "fingerprint": self.fingerprint,
+            "model_id": self.model_id,
+            "links": self.links or [],
+            "files": [
+                {"name": name, "sha256": sha256}
+                for name, sha256 in zip(self.file_names or [], self.file_hashes or [])
+            ],
+            "retrieval_profile": self.retrieval_profile,
+            "pipeline_version": self.pipeline_version,
+            # pipeline_version lists the configured candidates; this is the
+            # provider:model that actually wrote the response.
+            "generation_model": (self.stats or {}).get("generation", {}).get("model"),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+        if include_response:
+            data["response"] = self.response
+            data["stats"] = self.stats
+        return data
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -75,8 +216,12 @@ class User(Base):
     password_hash = Column(String(256), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(Date, default=datetime.now())
+    catalog_version = Column(Integer, nullable=False, default=0, server_default="0")
     models = relationship("ModelEntry", back_populates="user")
 
+    def bump_catalog_version(self):
+        self.catalog_version = User.catalog_version + 1
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -95,3 +240,4 @@ class User(Base):
 
 
 Base.metadata.create_all(engine)
+apply_schema_upgrades(engine)
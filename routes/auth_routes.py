@@ -1,5 +1,7 @@
 import os
 from flask import Blueprint, request, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
 from models.models import User, session
 from flask_cors import cross_origin, CORS
 import jwt
@@ -8,6 +10,7 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from utils.typing import ApiResponseHandler
 from utils.logging import logger
+from utils.cache import get_cache
 
 load_dotenv()
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -24,6 +27,64 @@ CORS(
 )
 
 SECRET_KEY = os.getenv("SECRET_KEY")
+USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 60))
+# Enough of a user for authenticated routes; anything else loads lazily.
+# catalog_version is left out: ETags and change feeds read it fresh, since
+# with the lru backend another worker's cached copy can lag behind a write.
+USER_CACHE_COLUMNS = ("id", "username", "email", "is_active")
+
+user_cache = get_cache("users", USER_CACHE_TTL)
+
+
+def _load_user(user_id):
+    key = str(user_id)
+    cached = user_cache.get(key)
+    # Read before the SELECT: a write committed after it bumps the generation,
+    # so a row loaded before that commit is never trusted from the cache.
+    generation = user_cache.generation(key)
+    if (
+        cached is not None
+        and generation is not None
+        and cached.get("generation") == generation
+    ):
+        # Attach the cached row to the session without a SELECT.
+        user = User(**cached["user"])
+        make_transient_to_detached(user)
+        return session.merge(user, load=False)
+    user = session.get(User, user_id)
+    if user is not None and generation is not None:
+        user_cache.set(
+            key,
+            {
+                "generation": generation,
+                "user": {
+                    column: getattr(user, column) for column in USER_CACHE_COLUMNS
+                },
+            },
+        )
+    return user
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(flush_session, flush_context):
+    changed = flush_session.info.setdefault("changed_user_ids", set())
+    for instance in list(flush_session.dirty) + list(flush_session.deleted):
+        if isinstance(instance, User):
+            changed.add(instance.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(commit_session):
+    # A request that read the row before this commit holds the old generation,
+    # so its cache entry (set before or after this point) no longer matches.
+    for user_id in commit_session.info.pop("changed_user_ids", ()):
+        user_cache.bump_generation(str(user_id))
+        user_cache.delete(str(user_id))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(rollback_session):
+    rollback_session.info.pop("changed_user_ids", None)
 
 
 def token_required(f):
@@ -36,7 +97,7 @@ def token_required(f):
         try:
             token = token.split(" ")[1]
             data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            current_user = session.query(User).get(data["user_id"])
+            current_user = _load_user(data["user_id"])
             if not current_user:
                 logger.warning(
                     f"Invalid token used - user not found for ID: {data.get('user_id')}"
@@ -130,7 +191,7 @@ def login():
 @cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
 @token_required
 def verify_token(current_user):
-    logger.debug(f"Token verification successful for user: {current_user.username}")
+    logger.debug("Token verification successful for user: %s", current_user.username)
     return jsonify(ApiResponseHandler.success({"user": current_user.to_dict()})), 200
 
 
@@ -159,6 +220,10 @@ def update_user(current_user, user_id):
                 return jsonify(
                     ApiResponseHandler.error("Username already exists", 400)
                 ), 400
+            if data["username"] != user.username:
+                # Usernames are embedded in model payloads, so cached catalog
+                # representations must be revalidated.
+                user.bump_catalog_version()
             user.username = data["username"]
 
         if "email" in data:
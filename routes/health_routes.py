@@ -1,9 +1,15 @@
 import os
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, send_file
 from flask_cors import cross_origin, CORS
 from utils.typing import ApiResponseHandler
 from dotenv import load_dotenv
 from utils.logging import logger
+from utils.compression import payload_stats
+from utils.metrics import registry
+from utils.cache import cache_stats
+from services.llm_router import get_router
+from utils.profiling import is_profiling_authorized
+from services.health_service import HealthService
 
 load_dotenv()
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -21,6 +27,8 @@ CORS(
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+health_service = HealthService()
+
 
 @bp.route("/", methods=["GET", "OPTIONS"])
 @cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
@@ -29,3 +37,84 @@ def check_health():
     return jsonify(
         ApiResponseHandler.success({"status": "healthy", "status_code": 200})
     ), 200
+
+
+@bp.route("/live", methods=["GET"])
+def check_liveness():
+    return jsonify(ApiResponseHandler.success({"status": "alive"})), 200
+
+
+@bp.route("/ready", methods=["GET"])
+def check_readiness():
+    result = health_service.check_readiness()
+    if not result["ready"]:
+        failing = [name for name, check in result["checks"].items() if not check["ok"]]
+        return jsonify(
+            ApiResponseHandler.error(
+                "Service not ready", 503, error=f"Failing checks: {', '.join(failing)}"
+            )
+        ), 503
+    return jsonify(
+        ApiResponseHandler.success({"status": "ready", "checks": result["checks"]})
+    ), 200
+
+
+@bp.route("/payload-stats", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+def get_payload_stats():
+    logger.debug("Payload stats requested from IP: %s", request.remote_addr)
+    return jsonify(ApiResponseHandler.success(payload_stats.snapshot())), 200
+
+
+@bp.route("/cache-stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(ApiResponseHandler.success(cache_stats())), 200
+
+
+@bp.route("/llm-stats", methods=["GET"])
+def get_llm_stats():
+    return jsonify(ApiResponseHandler.success(get_router().snapshot())), 200
+
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _profile_store():
+    # Reports hold SQL and call details, so they need the profiling token.
+    store = current_app.extensions.get("profile_store")
+    if store is None or not is_profiling_authorized(current_app):
+        return None
+    return store
+
+
+@bp.route("/profiles", methods=["GET"])
+def list_profiles():
+    store = _profile_store()
+    if store is None:
+        return jsonify(ApiResponseHandler.error("Not found", 404)), 404
+    return jsonify(ApiResponseHandler.success(store.list())), 200
+
+
+@bp.route("/profiles/<report_id>", methods=["GET"])
+def get_profile(report_id):
+    store = _profile_store()
+    report = store.get(report_id) if store else None
+    if report is None:
+        return jsonify(ApiResponseHandler.error("Profile not found", 404)), 404
+    return jsonify(ApiResponseHandler.success(report)), 200
+
+
+@bp.route("/profiles/<report_id>/pstats", methods=["GET"])
+def download_profile_stats(report_id):
+    store = _profile_store()
+    stats_path = store.stats_path(report_id) if store else None
+    if stats_path is None:
+        return jsonify(ApiResponseHandler.error("Profile not found", 404)), 404
+    return send_file(
+        stats_path,
+        mimetype="application/octet-stream",
+        as_attachment=True,
+        download_name=f"{report_id}.prof",
+    )
@@ -1,19 +1,87 @@
 import os
-from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
-from models.models import ModelEntry, session
+from flask import Blueprint, request, jsonify, current_app
+from models.models import AutofillRun, ModelEntry, ModelTombstone, session
 from datetime import datetime
-from services.agent_service import AgentService
+from sqlalchemy import (
+    all_,
+    any_,
+    delete,
+    func,
+    insert,
+    not_,
+    select,
+    String,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from services.agent_service import (
+    AgentService,
+    MAX_LINKS,
+    RETRIEVAL_PROFILES,
+    DEFAULT_RETRIEVAL_PROFILE,
+)
 from services.model_insights_service import ModelInsightsService
 from services.semantic_search_service import SemanticSearchService
+from services.autocomplete_service import (
+    AUTOCOMPLETE_DEFAULT_LIMIT,
+    AUTOCOMPLETE_FIELDS,
+    AUTOCOMPLETE_MAX_LIMIT,
+    AutocompleteIndex,
+    model_field_values,
+)
+from services.catalog_stats_service import cached_catalog_stats
+from services.insights_pregeneration_service import (
+    InsightsPregenerator,
+    load_stored_insights,
+)
+from services.similarity_service import SIMILARITY_TEXT_FIELDS, SimilarityService
+from services.autofill_run_service import (
+    AUTOFILL_HISTORY_DEFAULT_LIMIT,
+    AUTOFILL_HISTORY_MAX_LIMIT,
+    autofill_fingerprint,
+    list_runs,
+    load_latest_run,
+    pipeline_version,
+    store_run,
+)
 from flask_cors import cross_origin, CORS
 from utils.typing import ApiResponseHandler
 from routes.auth_routes import token_required
 from dotenv import load_dotenv
 from utils.logging import logger
+from utils.singleflight import SingleFlight
+from utils.metrics import record_cache_lookup
+from utils.uploads import spooled_uploads
+from utils.urls import canonicalize_url
+from utils.http_cache import (
+    compute_etag,
+    is_not_modified,
+    not_modified_response,
+    apply_cache_headers,
+)
 
 load_dotenv()
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", 500))
+CHANGES_MAX_PAGE_SIZE = 2000
+# Maintained by the database; ignored when clients echo them back.
+SYNC_FIELDS = ("updated_at", "change_seq")
+# Fields a bulk update may set on every selected model.
+BULK_EDITABLE_FIELDS = (
+    "name",
+    "developer",
+    "model_type",
+    "status",
+    "date_interacted",
+    "tags",
+    "notes",
+    "source_links",
+    "parameters",
+    "license",
+    "version",
+)
+BULK_MAX_IDS = int(os.getenv("BULK_MAX_IDS", 5000))
+SIMILAR_DEFAULT_LIMIT = 10
 
 bp = Blueprint("models", __name__, url_prefix="/models")
 CORS(
@@ -22,12 +90,132 @@ CORS(
         r"/*": {
             "origins": [FRONTEND_URL],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "expose_headers": ["ETag", "X-Request-ID"],
         }
     },
 )
 
 model_insights_service = ModelInsightsService()
 semantic_search_service = SemanticSearchService()
+autocomplete_index = AutocompleteIndex()
+# Identical concurrent LLM-backed requests in this worker share one computation.
+llm_flight = SingleFlight("llm_requests")
+insights_pregenerator = InsightsPregenerator(model_insights_service, llm_flight)
+similarity_service = SimilarityService(semantic_search_service)
+
+
+def _model_filters(filters):
+    # Shared by search and the bulk endpoints so both select the same models.
+    conditions = []
+    if filters.get("q"):
+        conditions.append(ModelEntry.name.ilike(f"%{filters['q']}%"))
+    if filters.get("type"):
+        conditions.append(ModelEntry.model_type == filters["type"])
+    if filters.get("status"):
+        conditions.append(ModelEntry.status == filters["status"])
+    if filters.get("tag"):
+        conditions.append(ModelEntry.tags.any(filters["tag"]))
+    return conditions
+
+
+def _bulk_selection(current_user, data):
+    # Returns (conditions, None) or (None, error message).
+    ids, filters = data.get("ids"), data.get("filter")
+    if (ids is None) == (filters is None):
+        return None, "Provide exactly one of ids or filter"
+    conditions = [ModelEntry.user_id == current_user.id]
+    if ids is not None:
+        if not isinstance(ids, list) or not all(
+            isinstance(model_id, int) and not isinstance(model_id, bool)
+            for model_id in ids
+        ):
+            return None, "ids must be a list of integers"
+        if len(ids) > BULK_MAX_IDS:
+            return None, f"At most {BULK_MAX_IDS} ids per request"
+        conditions.append(ModelEntry.id.in_(ids))
+    else:
+        if not isinstance(filters, dict) or not all(
+            isinstance(value, str) for value in filters.values() if value
+        ):
+            return None, "filter must be an object of strings"
+        conditions.extend(_model_filters(filters))
+    return conditions, None
+
+
+def _retagged(add_tags, remove_tags):
+    # In-place SQL for tags: append new tags in order, then drop removed ones.
+    tags = func.coalesce(ModelEntry.tags, array([], type_=String))
+    if add_tags:
+        added = func.unnest(array(add_tags, type_=String)).table_valued("tag")
+        added = added.render_derived()
+        tags = tags.op("||")(
+            func.array(
+                select(added.c.tag)
+                .where(not_(added.c.tag == any_(tags)))
+                .correlate(ModelEntry)
+                .scalar_subquery()
+            )
+        )
+    if remove_tags:
+        kept = func.unnest(tags).table_valued("tag").render_derived()
+        tags = func.array(
+            select(kept.c.tag)
+            .where(kept.c.tag != all_(array(remove_tags, type_=String)))
+            .correlate(ModelEntry)
+            .scalar_subquery()
+        )
+    return tags.cast(ARRAY(String))
+
+
+def _run_autofill(model_id, model_links, doc_sources, retrieval_profile):
+    agent_service = AgentService(
+        model_id=model_id,
+        model_links=model_links,
+        doc_sources=doc_sources,
+        retrieval_profile=retrieval_profile,
+    )
+    response = agent_service.run_agent()
+    return {"response": response, "stats": agent_service.stats}
+
+
+def _load_or_run_autofill(
+    user_id,
+    fingerprint,
+    model_id,
+    model_links,
+    uploads,
+    retrieval_profile,
+    version,
+    force_refresh,
+):
+    stored = None if force_refresh else load_latest_run(user_id, fingerprint)
+    if stored is not None:
+        logger.info(f"Returning stored autofill run {stored.id} for model {model_id}")
+        return stored.to_dict(), True
+    # Don't hold a pooled DB connection through scraping and LLM calls.
+    session.close()
+
+    # The pipeline itself is shared with other users' identical requests.
+    autofill_result = llm_flight.do(
+        ("autofill", fingerprint),
+        _run_autofill,
+        model_id,
+        model_links,
+        [upload.source() for upload in uploads],
+        retrieval_profile,
+    )
+    run = store_run(
+        user_id,
+        fingerprint,
+        model_id,
+        model_links,
+        [(upload.filename, upload.sha256) for upload in uploads],
+        retrieval_profile,
+        version,
+        autofill_result,
+    )
+    logger.info(f"Successfully completed autofill for model {model_id}")
+    return run.to_dict(), False
 
 
 @bp.route("/", methods=["GET", "OPTIONS"])
@@ -37,8 +225,17 @@ def get_models(current_user):
     if request.method == "OPTIONS":
         return "", 200
     logger.info(f"Fetching all models for user: {current_user.username}")
-    models = session.query(ModelEntry).all()
-    return jsonify(ApiResponseHandler.success([model.to_dict() for model in models]))
+    cache_control = current_app.config["CATALOG_CACHE_CONTROL"]
+    etag = compute_etag("models", current_user.id, current_user.catalog_version)
+    if is_not_modified(etag):
+        logger.debug("Model list unchanged for user: %s", current_user.username)
+        return not_modified_response(etag, cache_control)
+
+    models = session.query(ModelEntry).filter_by(user_id=current_user.id).all()
+    response = jsonify(
+        ApiResponseHandler.success([model.to_dict() for model in models])
+    )
+    return apply_cache_headers(response, etag, cache_control)
 
 
 @bp.route("/<int:id>", methods=["GET", "OPTIONS"])
@@ -48,11 +245,60 @@ def get_model(current_user, id):
     if request.method == "OPTIONS":
         return "", 200
     logger.info(f"Fetching model {id} for user: {current_user.username}")
+    cache_control = current_app.config["CATALOG_CACHE_CONTROL"]
+    etag = compute_etag("model", current_user.id, current_user.catalog_version, id)
+    if is_not_modified(etag):
+        logger.debug("Model %s unchanged for user: %s", id, current_user.username)
+        return not_modified_response(etag, cache_control)
+
+    model = session.query(ModelEntry).filter_by(id=id, user_id=current_user.id).first()
+    if not model:
+        logger.warning(f"Model {id} not found for user: {current_user.username}")
+        return jsonify(ApiResponseHandler.error("Model not found", 404)), 404
+    response = jsonify(ApiResponseHandler.success(model.to_dict()))
+    return apply_cache_headers(response, etag, cache_control)
+
+
+@bp.route("/<int:id>/similar", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+@token_required
+def get_similar_models(current_user, id):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    try:
+        limit = int(request.args.get("limit", SIMILAR_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify(ApiResponseHandler.error("limit must be an integer", 400)), 400
+
+    logger.info(f"Fetching models similar to {id} for user: {current_user.username}")
     model = session.query(ModelEntry).filter_by(id=id, user_id=current_user.id).first()
     if not model:
         logger.warning(f"Model {id} not found for user: {current_user.username}")
         return jsonify(ApiResponseHandler.error("Model not found", 404)), 404
-    return jsonify(ApiResponseHandler.success(model.to_dict()))
+
+    try:
+        # Normally maintained in the background. A catalog without a graph is
+        # built there too; a single model not embedded yet is done now.
+        if not similarity_service.has_embedding(id):
+            if similarity_service.needs_build(current_user.id):
+                similarity_service.schedule_build(current_user.id)
+                return jsonify(
+                    ApiResponseHandler.success(
+                        {"id": id, "similar": [], "pending": True}
+                    )
+                ), 200
+            llm_flight.do(("similar", id), similarity_service.refresh_neighbors, model)
+        similar = similarity_service.similar(
+            id, max(1, min(limit, similarity_service.k))
+        )
+        return jsonify(
+            ApiResponseHandler.success({"id": id, "similar": similar, "pending": False})
+        ), 200
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Failed to find models similar to {id}: {str(e)}")
+        return jsonify(ApiResponseHandler.error(str(e), 500)), 500
 
 
 @bp.route("/", methods=["POST", "OPTIONS"])
@@ -64,6 +310,8 @@ def create_model(current_user):
 
     data = request.get_json()
     logger.info(f"Creating new model for user: {current_user.username}")
+    for field in SYNC_FIELDS:
+        data.pop(field, None)
 
     if "date_interacted" in data and data["date_interacted"]:
         data["date_interacted"] = datetime.fromisoformat(data["date_interacted"]).date()
@@ -72,8 +320,18 @@ def create_model(current_user):
     model = ModelEntry(**data)
 
     try:
+        version_before = current_user.catalog_version
         session.add(model)
+        current_user.bump_catalog_version()
         session.commit()
+        insights_pregenerator.schedule(model.id)
+        similarity_service.schedule(model.id)
+        autocomplete_index.apply(
+            current_user.id,
+            version_before,
+            current_user.catalog_version,
+            added=model_field_values(model),
+        )
         logger.info(
             f"Successfully created model {model.id} for user: {current_user.username}"
         )
@@ -81,6 +339,7 @@ def create_model(current_user):
             ApiResponseHandler.success(model.to_dict(), status_code=201)
         ), 201
     except Exception as e:
+        session.rollback()
         logger.error(
             f"Failed to create model for user {current_user.username}: {str(e)}"
         )
@@ -105,20 +364,35 @@ def update_model(current_user, id):
 
     try:
         data = request.get_json()
+        for field in SYNC_FIELDS:
+            data.pop(field, None)
         if "date_interacted" in data and data["date_interacted"]:
             data["date_interacted"] = datetime.fromisoformat(
                 data["date_interacted"]
             ).date()
 
+        version_before = current_user.catalog_version
+        removed = model_field_values(model)
         for key, value in data.items():
             setattr(model, key, value)
 
+        current_user.bump_catalog_version()
         session.commit()
+        insights_pregenerator.schedule(id)
+        similarity_service.schedule(id)
+        autocomplete_index.apply(
+            current_user.id,
+            version_before,
+            current_user.catalog_version,
+            removed=removed,
+            added=model_field_values(model),
+        )
         logger.info(
             f"Successfully updated model {id} for user: {current_user.username}"
         )
         return jsonify(ApiResponseHandler.success(model.to_dict()))
     except Exception as e:
+        session.rollback()
         logger.error(
             f"Failed to update model {id} for user {current_user.username}: {str(e)}"
         )
@@ -142,8 +416,29 @@ def delete_model(current_user, id):
         return jsonify(ApiResponseHandler.error("Model not found", 404)), 404
 
     try:
+        version_before = current_user.catalog_version
+        removed = model_field_values(model)
+        # Their neighbour lists lose this model and must be refilled.
+        listing = similarity_service.listing_models([id])
+        # Flush the version bump first: ModelTombstone has no relationship
+        # to User, so its change stamp would otherwise be drawn before the
+        # user row lock that orders the stamps.
+        current_user.bump_catalog_version()
+        session.flush()
         session.delete(model)
+        session.add(ModelTombstone(id=id, user_id=current_user.id))
         session.commit()
+        insights_pregenerator.cancel(id)
+        similarity_service.cancel(id)
+        for model_id in listing:
+            if model_id != id:
+                similarity_service.schedule(model_id)
+        autocomplete_index.apply(
+            current_user.id,
+            version_before,
+            current_user.catalog_version,
+            removed=removed,
+        )
         logger.info(
             f"Successfully deleted model {id} for user: {current_user.username}"
         )
@@ -153,12 +448,296 @@ def delete_model(current_user, id):
             )
         ), 204
     except Exception as e:
+        session.rollback()
         logger.error(
             f"Failed to delete model {id} for user {current_user.username}: {str(e)}"
         )
         return jsonify(ApiResponseHandler.error(str(e), 500)), 500
 
 
+@bp.route("/autocomplete", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+@token_required
+def autocomplete(current_user):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    field = request.args.get("field", "")
+    if field not in AUTOCOMPLETE_FIELDS:
+        return jsonify(
+            ApiResponseHandler.error(
+                f"field must be one of: {', '.join(AUTOCOMPLETE_FIELDS)}", 400
+            )
+        ), 400
+    try:
+        limit = min(
+            int(request.args.get("limit", AUTOCOMPLETE_DEFAULT_LIMIT)),
+            AUTOCOMPLETE_MAX_LIMIT,
+        )
+    except ValueError:
+        return jsonify(ApiResponseHandler.error("limit must be an integer", 400)), 400
+
+    suggestions = autocomplete_index.suggest(
+        current_user.id,
+        current_user.catalog_version,
+        field,
+        request.args.get("prefix", ""),
+        max(limit, 1),
+    )
+    return jsonify(
+        ApiResponseHandler.success({"field": field, "suggestions": suggestions})
+    ), 200
+
+
+@bp.route("/bulk-update", methods=["POST", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["POST", "OPTIONS"])
+@token_required
+def bulk_update_models(current_user):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    data = request.get_json(silent=True) or {}
+    conditions, error = _bulk_selection(current_user, data)
+    if error:
+        return jsonify(ApiResponseHandler.error(error, 400)), 400
+
+    patch = data.get("patch") or {}
+    add_tags = data.get("add_tags") or []
+    remove_tags = data.get("remove_tags") or []
+    if not isinstance(patch, dict) or set(patch) - set(BULK_EDITABLE_FIELDS):
+        return jsonify(
+            ApiResponseHandler.error(
+                f"patch may only set: {', '.join(BULK_EDITABLE_FIELDS)}", 400
+            )
+        ), 400
+    if not (
+        isinstance(add_tags, list)
+        and isinstance(remove_tags, list)
+        and all(isinstance(tag, str) for tag in add_tags + remove_tags)
+    ):
+        return jsonify(
+            ApiResponseHandler.error(
+                "add_tags and remove_tags must be lists of strings", 400
+            )
+        ), 400
+    add_tags = list(dict.fromkeys(add_tags))
+    remove_tags = list(dict.fromkeys(remove_tags))
+    if "tags" in patch and (add_tags or remove_tags):
+        return jsonify(
+            ApiResponseHandler.error(
+                "Use either patch.tags or add_tags/remove_tags", 400
+            )
+        ), 400
+    if not patch and not add_tags and not remove_tags:
+        return jsonify(ApiResponseHandler.error("Nothing to update", 400)), 400
+
+    values = dict(patch)
+    if values.get("date_interacted"):
+        try:
+            values["date_interacted"] = datetime.fromisoformat(
+                values["date_interacted"]
+            ).date()
+        except (TypeError, ValueError):
+            return jsonify(
+                ApiResponseHandler.error("date_interacted must be an ISO date", 400)
+            ), 400
+    if add_tags or remove_tags:
+        values["tags"] = _retagged(add_tags, remove_tags)
+
+    logger.info(f"Bulk updating models for user: {current_user.username}")
+    try:
+        # Flush the version bump first: its row lock orders the change stamps.
+        current_user.bump_catalog_version()
+        session.flush()
+        updated_ids = (
+            session.execute(
+                update(ModelEntry)
+                .where(*conditions)
+                .values(**values)
+                .returning(ModelEntry.id),
+                execution_options={"synchronize_session": False},
+            )
+            .scalars()
+            .all()
+        )
+        if not updated_ids:
+            session.rollback()
+        else:
+            session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Bulk update failed for user {current_user.username}: {str(e)}")
+        return jsonify(ApiResponseHandler.error(str(e), 500)), 500
+
+    autocomplete_index.discard(current_user.id)
+    if set(values) & set(model_insights_service.CONTEXT_FIELDS):
+        for model_id in updated_ids:
+            insights_pregenerator.schedule(model_id)
+    if set(values) & set(SIMILARITY_TEXT_FIELDS):
+        for model_id in updated_ids:
+            similarity_service.schedule(model_id)
+    logger.info(
+        f"Bulk updated {len(updated_ids)} models for user: {current_user.username}"
+    )
+    return jsonify(
+        ApiResponseHandler.success({"updated": len(updated_ids), "ids": updated_ids})
+    ), 200
+
+
+@bp.route("/bulk-delete", methods=["POST", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["POST", "OPTIONS"])
+@token_required
+def bulk_delete_models(current_user):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    data = request.get_json(silent=True) or {}
+    conditions, error = _bulk_selection(current_user, data)
+    if error:
+        return jsonify(ApiResponseHandler.error(error, 400)), 400
+
+    logger.info(f"Bulk deleting models for user: {current_user.username}")
+    try:
+        listing = similarity_service.listing_models(
+            select(ModelEntry.id).where(*conditions)
+        )
+        current_user.bump_catalog_version()
+        session.flush()
+        deleted_ids = (
+            session.execute(
+                delete(ModelEntry).where(*conditions).returning(ModelEntry.id),
+                execution_options={"synchronize_session": False},
+            )
+            .scalars()
+            .all()
+        )
+        if not deleted_ids:
+            session.rollback()
+        else:
+            session.execute(
+                insert(ModelTombstone),
+                [
+                    {"id": model_id, "user_id": current_user.id}
+                    for model_id in deleted_ids
+                ],
+            )
+            session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Bulk delete failed for user {current_user.username}: {str(e)}")
+        return jsonify(ApiResponseHandler.error(str(e), 500)), 500
+
+    autocomplete_index.discard(current_user.id)
+    for model_id in deleted_ids:
+        insights_pregenerator.cancel(model_id)
+        similarity_service.cancel(model_id)
+    for model_id in set(listing) - set(deleted_ids):
+        similarity_service.schedule(model_id)
+    logger.info(
+        f"Bulk deleted {len(deleted_ids)} models for user: {current_user.username}"
+    )
+    return jsonify(
+        ApiResponseHandler.success({"deleted": len(deleted_ids), "ids": deleted_ids})
+    ), 200
+
+
+@bp.route("/stats", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+@token_required
+def get_catalog_stats(current_user):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    logger.info(f"Fetching catalog stats for user: {current_user.username}")
+    cache_control = current_app.config["CATALOG_CACHE_CONTROL"]
+    etag = compute_etag("stats", current_user.id, current_user.catalog_version)
+    if is_not_modified(etag):
+        return not_modified_response(etag, cache_control)
+
+    stats = cached_catalog_stats(current_user.id, current_user.catalog_version)
+    response = jsonify(ApiResponseHandler.success(stats))
+    return apply_cache_headers(response, etag, cache_control)
+
+
+@bp.route("/changes", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+@token_required
+def get_model_changes(current_user):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    try:
+        since = int(request.args.get("since", 0))
+        limit = min(
+            int(request.args.get("limit", CHANGES_PAGE_SIZE)), CHANGES_MAX_PAGE_SIZE
+        )
+    except ValueError:
+        return jsonify(
+            ApiResponseHandler.error("since and limit must be integers", 400)
+        ), 400
+    if since < 0 or limit < 1:
+        return jsonify(
+            ApiResponseHandler.error("since must be >= 0 and limit >= 1", 400)
+        ), 400
+
+    logger.info(f"Fetching changes since {since} for user: {current_user.username}")
+    cache_control = current_app.config["CATALOG_CACHE_CONTROL"]
+    etag = compute_etag(
+        "changes", current_user.id, current_user.catalog_version, since, limit
+    )
+    if is_not_modified(etag):
+        return not_modified_response(etag, cache_control)
+
+    models = (
+        session.query(ModelEntry)
+        .filter(ModelEntry.user_id == current_user.id, ModelEntry.change_seq > since)
+        .order_by(ModelEntry.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+    # A first sync (since=0) has nothing to delete.
+    tombstones = (
+        session.query(ModelTombstone.id, ModelTombstone.change_seq)
+        .filter(
+            ModelTombstone.user_id == current_user.id,
+            ModelTombstone.change_seq > since,
+        )
+        .order_by(ModelTombstone.change_seq)
+        .limit(limit + 1)
+        .all()
+        if since
+        else []
+    )
+
+    # Both lists are ordered, so their first limit + 1 entries cover the page.
+    entries = sorted(
+        [(model.change_seq, model) for model in models]
+        + [(tombstone.change_seq, tombstone.id) for tombstone in tombstones],
+        key=lambda entry: entry[0],
+    )
+    page = entries[:limit]
+    return apply_cache_headers(
+        jsonify(
+            ApiResponseHandler.success(
+                {
+                    "changes": [
+                        entry.to_dict()
+                        for _, entry in page
+                        if isinstance(entry, ModelEntry)
+                    ],
+                    "deleted": [
+                        entry for _, entry in page if not isinstance(entry, ModelEntry)
+                    ],
+                    "cursor": page[-1][0] if page else since,
+                    "has_more": len(entries) > limit,
+                }
+            )
+        ),
+        etag,
+        cache_control,
+    )
+
+
 @bp.route("/search", methods=["GET", "OPTIONS"])
 @cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
 @token_required
@@ -175,16 +754,10 @@ def search_models(current_user):
         f"Searching models for user {current_user.username} with query: {query}"
     )
 
-    models = session.query(ModelEntry).filter_by(user_id=current_user.id)
-
-    if query:
-        models = models.filter(ModelEntry.name.ilike(f"%{query}%"))
-    if model_type:
-        models = models.filter(ModelEntry.model_type == model_type)
-    if status:
-        models = models.filter(ModelEntry.status == status)
-    if tag:
-        models = models.filter(ModelEntry.tags.contains([tag]))
+    models = session.query(ModelEntry).filter(
+        ModelEntry.user_id == current_user.id,
+        *_model_filters({"q": query, "type": model_type, "status": status, "tag": tag}),
+    )
 
     return jsonify(
         ApiResponseHandler.success([model.to_dict() for model in models.all()])
@@ -199,47 +772,109 @@ def autofill_model(current_user):
         return "", 200
 
     logger.info(f"Starting model autofill for user: {current_user.username}")
-    upload_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
+    retrieval_profile = request.form.get(
+        "retrieval_profile", DEFAULT_RETRIEVAL_PROFILE
+    ).lower()
+    if retrieval_profile not in RETRIEVAL_PROFILES:
+        return jsonify(
+            ApiResponseHandler.error(
+                f"retrieval_profile must be one of: {', '.join(RETRIEVAL_PROFILES)}",
+                400,
+            )
+        ), 400
+
+    model_id = (request.form.get("model_id") or "").strip()
+    if not model_id:
+        return jsonify(ApiResponseHandler.error("model_id is required", 400)), 400
+    model_links = [link for link in request.form.getlist("model_links") if link.strip()]
+    if len({canonicalize_url(link) for link in model_links}) > MAX_LINKS:
+        return jsonify(
+            ApiResponseHandler.error(f"At most {MAX_LINKS} model_links", 400)
+        ), 400
+    force_refresh = request.form.get("force_refresh", "false").lower() == "true"
+
+    # Uploads were spooled and hashed by the request parser; the context
+    # manager removes this request's temp files however the call ends.
+    with spooled_uploads() as uploads:
+        logger.debug(
+            "Received %d uploads (%d spooled to disk)",
+            len(uploads),
+            sum(not upload.in_memory for upload in uploads),
+        )
+        try:
+            version = pipeline_version()
+            fingerprint = autofill_fingerprint(
+                model_id,
+                model_links,
+                [upload.sha256 for upload in uploads],
+                retrieval_profile,
+                version,
+            )
+            # Concurrent identical requests from one user share the lookup,
+            # the pipeline run and the stored row.
+            run, cached = llm_flight.do(
+                ("autofill_run", current_user.id, fingerprint, force_refresh),
+                _load_or_run_autofill,
+                current_user.id,
+                fingerprint,
+                model_id,
+                model_links,
+                uploads,
+                retrieval_profile,
+                version,
+                force_refresh,
+            )
+            return jsonify(ApiResponseHandler.success({**run, "cached": cached})), 200
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Autofill failed for model {model_id}: {str(e)}")
+            return jsonify(ApiResponseHandler.error(str(e), 500)), 500
+
 
-    model_id = request.form.get("model_id")
-    model_links = request.form.getlist("model_links")
-    uploaded_files = request.files.getlist("files")
+@bp.route("/autofill/runs", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+@token_required
+def get_autofill_runs(current_user):
+    if request.method == "OPTIONS":
+        return "", 200
 
-    file_paths = []
     try:
-        for file in uploaded_files:
-            if file and file.filename:
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(upload_dir, filename)
-                file.save(file_path)
-                file_paths.append(file_path)
-                logger.debug(f"Saved uploaded file: {filename}")
-
-        agent_service = AgentService(
-            model_id=model_id, model_links=model_links, doc_paths=file_paths
+        limit = int(request.args.get("limit", AUTOFILL_HISTORY_DEFAULT_LIMIT))
+        before = request.args.get("before")
+        before = int(before) if before else None
+    except ValueError:
+        return jsonify(
+            ApiResponseHandler.error("limit and before must be integers", 400)
+        ), 400
+
+    logger.info(f"Fetching autofill runs for user: {current_user.username}")
+    runs = list_runs(
+        current_user.id,
+        model_id=request.args.get("model_id"),
+        before=before,
+        limit=max(1, min(limit, AUTOFILL_HISTORY_MAX_LIMIT)),
+    )
+    return jsonify(
+        ApiResponseHandler.success(
+            {
+                "runs": [run.to_dict(include_response=False) for run in runs],
+                "next_before": runs[-1].id if runs else None,
+            }
         )
-        agent_response = agent_service.run_agent()
-        logger.info(f"Successfully completed autofill for model {model_id}")
+    ), 200
 
-        for file_path in file_paths:
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                logger.warning(f"Failed to remove temporary file {file_path}: {str(e)}")
 
-        return jsonify(ApiResponseHandler.success({"response": agent_response})), 200
-    except Exception as e:
-        logger.error(f"Autofill failed for model {model_id}: {str(e)}")
-        for file_path in file_paths:
-            try:
-                os.remove(file_path)
-            except Exception as cleanup_error:
-                logger.warning(
-                    f"Failed to remove temporary file {file_path}: {str(cleanup_error)}"
-                )
-        return jsonify(ApiResponseHandler.error(str(e), 500)), 500
+@bp.route("/autofill/runs/<int:run_id>", methods=["GET", "OPTIONS"])
+@cross_origin(origins=[FRONTEND_URL], methods=["GET", "OPTIONS"])
+@token_required
+def get_autofill_run(current_user, run_id):
+    if request.method == "OPTIONS":
+        return "", 200
+
+    run = session.get(AutofillRun, run_id)
+    if run is None or run.user_id != current_user.id:
+        return jsonify(ApiResponseHandler.error("Autofill run not found", 404)), 404
+    return jsonify(ApiResponseHandler.success(run.to_dict())), 200
 
 
 @bp.route("/<int:id>/insights", methods=["GET", "POST", "OPTIONS"])
@@ -258,10 +893,30 @@ def get_model_insights(id):
         logger.warning(f"Model {id} not found for insights generation")
         return jsonify(ApiResponseHandler.error("Model not found", 404)), 404
 
+    model_data = model.to_dict()
+    content_hash = model_insights_service.content_hash(model_data)
+    etag = compute_etag("insights", id, content_hash)
+    cache_control = f"private, max-age={current_app.config['INSIGHTS_CACHE_MAX_AGE']}"
+    if request.method == "GET" and is_not_modified(etag):
+        logger.debug("Insights for model %s unchanged, skipping generation", id)
+        return not_modified_response(etag, cache_control)
+
     try:
-        insights = model_insights_service.generate_model_insights(model.to_dict())
+        insights = load_stored_insights(content_hash)
+        record_cache_lookup("insights_store", insights is not None)
+        session.close()
+        if insights is None:
+            insights = llm_flight.do(
+                ("insights", id, content_hash, None),
+                insights_pregenerator.generate_and_store,
+                model_data,
+                content_hash,
+            )
         logger.info(f"Successfully generated insights for model {id}")
-        return jsonify(ApiResponseHandler.success(insights))
+        response = jsonify(ApiResponseHandler.success(insights))
+        if request.method == "GET":
+            apply_cache_headers(response, etag, cache_control)
+        return response
     except Exception as e:
         logger.error(f"Failed to generate insights for model {id}: {str(e)}")
         return jsonify(ApiResponseHandler.error(str(e), 500)), 500
@@ -288,14 +943,25 @@ def compare_models(current_user):
         models = (
             session.query(ModelEntry)
             .filter(ModelEntry.id.in_(model_ids), ModelEntry.user_id == current_user.id)
+            .order_by(ModelEntry.id)
             .all()
         )
         if not models:
             logger.warning(f"No models found for comparison with IDs: {model_ids}")
             return jsonify(ApiResponseHandler.error("No models found", 404)), 404
 
-        analysis = model_insights_service.analyze_multiple_models(
-            [model.to_dict() for model in models], custom_prompt
+        models_data = [model.to_dict() for model in models]
+        session.close()
+        analysis = llm_flight.do(
+            (
+                "compare",
+                tuple(model.id for model in models),
+                model_insights_service.comparison_hash(models_data, custom_prompt),
+                custom_prompt,
+            ),
+            model_insights_service.analyze_multiple_models,
+            models_data,
+            custom_prompt,
         )
         logger.info(f"Successfully compared models {model_ids}")
         return jsonify(ApiResponseHandler.success(analysis))
@@ -1,5 +1,10 @@
-from models.models import Base, engine
+from models.models import Base, engine, session
 from config import Config
+from utils.compression import init_compression
+from utils.metrics import init_metrics, instrument_engine
+from utils.logging import init_request_context
+from utils.uploads import init_uploads
+from utils.profiling import init_profiling
 from flask import Flask, request, make_response
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -7,11 +12,14 @@ import os
 
 load_dotenv()
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+WARM_MODELS_ON_STARTUP = os.getenv("WARM_MODELS_ON_STARTUP", "false").lower() == "true"
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    init_request_context(app)
+    init_profiling(app, engine)
 
     CORS(
         app,
@@ -19,7 +27,13 @@ def create_app(config_class=Config):
             r"/api/v1/*": {
                 "origins": [FRONTEND_URL],
                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                "allow_headers": ["Content-Type", "Authorization"],
+                "allow_headers": [
+                    "Content-Type",
+                    "Authorization",
+                    "If-None-Match",
+                    "X-Request-ID",
+                ],
+                "expose_headers": ["ETag", "X-Request-ID"],
                 "supports_credentials": True,
             }
         },
@@ -31,7 +45,8 @@ def create_app(config_class=Config):
             response = make_response()
             response.headers.add("Access-Control-Allow-Origin", FRONTEND_URL)
             response.headers.add(
-                "Access-Control-Allow-Headers", "Content-Type,Authorization"
+                "Access-Control-Allow-Headers",
+                "Content-Type,Authorization,If-None-Match,X-Request-ID",
             )
             response.headers.add(
                 "Access-Control-Allow-Methods", "GET,POST,PUT,DELETE,OPTIONS"
@@ -39,6 +54,14 @@ def create_app(config_class=Config):
             response.headers.add("Access-Control-Allow-Credentials", "true")
             return response
 
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        session.remove()
+
+    init_metrics(app)
+    init_compression(app)
+    init_uploads(app)
+
     from routes.health_routes import bp as health_bp
     from routes.model_routes import bp as models_bp
     from routes.auth_routes import bp as auth_bp
@@ -50,8 +73,16 @@ def create_app(config_class=Config):
     return app
 
 
-app = create_app()
-Base.metadata.create_all(engine)
+# Document parser processes import the main module as __mp_main__; under
+# `python run.py` they need none of the app.
+if __name__ != "__mp_main__":
+    instrument_engine(engine)
+    app = create_app()
+    if WARM_MODELS_ON_STARTUP:
+        from services.agent_service import warm_up_embeddings
+
+        warm_up_embeddings()
+    Base.metadata.create_all(engine)
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
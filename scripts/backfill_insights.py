@@ -0,0 +1,44 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from services.insights_pregeneration_service import (
+    PREGENERATE_CONCURRENCY,
+    find_models_missing_insights,
+    prune_stored_insights,
+)
+
+
+def backfill(limit: int, concurrency: int, dry_run: bool, prune: bool):
+    # The route module owns the shared services and single-flight, so a
+    # backfill running next to the API in one process never duplicates work.
+    from routes.model_routes import insights_pregenerator, model_insights_service
+
+    missing, current_hashes = find_models_missing_insights(model_insights_service)
+    print(f"{len(missing)} models have no stored insights")
+    if limit:
+        missing = missing[:limit]
+
+    if not dry_run and missing:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            generated = sum(executor.map(insights_pregenerator.pregenerate, missing))
+        print(f"Generated insights for {generated} of {len(missing)} models")
+
+    if prune and not dry_run:
+        print(f"Pruned {prune_stored_insights(current_hashes)} stale insights")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate and store insights for models that have none"
+    )
+    parser.add_argument("--limit", type=int, help="generate for at most this many")
+    parser.add_argument("--concurrency", type=int, default=PREGENERATE_CONCURRENCY)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only count the missing models"
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="delete stored insights that no longer match any model",
+    )
+    args = parser.parse_args()
+    backfill(args.limit, args.concurrency, args.dry_run, args.prune)
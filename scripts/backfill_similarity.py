@@ -0,0 +1,36 @@
+import argparse
+from models.models import ModelEntry, User, session
+from sqlalchemy import select
+
+
+def backfill(user_ids):
+    # Uses the route module's services so embeddings come from the same cache.
+    from routes.model_routes import similarity_service
+
+    if not user_ids:
+        user_ids = list(
+            session.scalars(
+                select(User.id).where(
+                    select(ModelEntry.id).filter_by(user_id=User.id).exists()
+                )
+            )
+        )
+    for user_id in user_ids:
+        try:
+            count = similarity_service.build_user_graph(user_id)
+            print(f"Built the similarity graph of user {user_id} ({count} models)")
+        except Exception as e:
+            session.rollback()
+            print(f"Failed to build the similarity graph of user {user_id}: {e}")
+    session.remove()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Embed models and build the similar models graph per user"
+    )
+    parser.add_argument(
+        "--user", type=int, action="append", help="only this user (repeatable)"
+    )
+    args = parser.parse_args()
+    backfill(args.user)
@@ -0,0 +1,43 @@
+import argparse
+import os
+from services.embedding_backends import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_ONNX_PATH,
+    ONNX_MODEL_FILE,
+    ONNX_QUANTIZED_MODEL_FILE,
+)
+
+
+def export(model_name: str, output_dir: str, quantize: bool):
+    # optimum is only needed to export, not to serve the ONNX backend.
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    print(f"Exported {model_name} to {os.path.join(output_dir, ONNX_MODEL_FILE)}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE)
+        quantize_dynamic(
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            quantized_path,
+            weight_type=QuantType.QInt8,
+        )
+        print(f"Wrote int8 dynamically quantized model to {quantized_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the autofill embedding model to ONNX for EMBEDDING_BACKEND=onnx"
+    )
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output-dir", default=EMBEDDING_ONNX_PATH)
+    parser.add_argument(
+        "--quantize", action="store_true", help="also write an int8 quantized model"
+    )
+    args = parser.parse_args()
+    export(args.model, args.output_dir, args.quantize)
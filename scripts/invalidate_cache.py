@@ -0,0 +1,14 @@
+import argparse
+from utils.cache import get_cache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Invalidate cache namespaces in every worker sharing the backend"
+    )
+    parser.add_argument(
+        "namespaces", nargs="+", help="for example embeddings, insights or users"
+    )
+    args = parser.parse_args()
+    for namespace in args.namespaces:
+        version = get_cache(namespace).invalidate()
+        print(f"{namespace}: version {version}")
@@ -1,48 +1,188 @@
+import hashlib
 import os
-from typing import List, Optional, Any
+import re
+import time
+import contextvars
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 import requests
 from bs4 import BeautifulSoup
 from langchain_community.vectorstores import FAISS
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import (
-    WebBaseLoader,
-    PyPDFLoader,
-    UnstructuredWordDocumentLoader,
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.prompts import PromptTemplate
+from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.tools import DuckDuckGoSearchResults
 from langchain_groq import ChatGroq
 from langchain.retrievers import EnsembleRetriever
+from langchain_community.retrievers import BM25Retriever
 from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from services.embedding_backends import create_embeddings
+from services.llm_router import get_router
+from services.document_parser import parse_documents
+from services.document_worker import create_text_splitter
 from utils.logging import logger
+from utils.metrics import track_call
+from utils.cache import get_cache
+from utils.dedup import deduplicate_documents
+from utils.urls import canonicalize_url
+from utils.uploads import DocumentSource
 
 load_dotenv()
 
+MAX_SCRAPE_WORKERS = int(os.getenv("AUTOFILL_MAX_SCRAPE_WORKERS", 8))
+DEDUP_ENABLED = os.getenv("AUTOFILL_DEDUP_ENABLED", "true").lower() == "true"
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("AUTOFILL_NEAR_DUPLICATE_DISTANCE", 6))
+
+# fast: single k-NN lookup; balanced: k-NN fused with local BM25;
+# thorough: k-NN fused with LLM-generated query variants (one extra LLM call).
+RETRIEVAL_PROFILES = ("fast", "balanced", "thorough")
+DEFAULT_RETRIEVAL_PROFILE = os.getenv("AUTOFILL_RETRIEVAL_PROFILE", "balanced").lower()
+RETRIEVAL_K = int(os.getenv("AUTOFILL_RETRIEVAL_K", 4))
+
+# Web pages fetched per autofill: at most MAX_LINKS, best ranked first, and
+# no further batches once the fetched text reaches WEB_TOKEN_BUDGET (0: no
+# budget). Tokens are estimated at CHARS_PER_TOKEN characters each.
+MAX_LINKS = int(os.getenv("AUTOFILL_MAX_LINKS", 8))
+WEB_TOKEN_BUDGET = int(os.getenv("AUTOFILL_WEB_TOKEN_BUDGET", 40000))
+CHARS_PER_TOKEN = 4
+SEARCH_CACHE_TTL = float(os.getenv("AUTOFILL_SEARCH_CACHE_TTL", 24 * 60 * 60))
+# How much a host is trusted for model details; subdomains inherit it.
+SOURCE_AUTHORITY = {
+    "huggingface.co": 1.0,
+    "arxiv.org": 0.95,
+    "github.com": 0.9,
+    "ai.meta.com": 0.9,
+    "ai.google.dev": 0.9,
+    "deepmind.google": 0.9,
+    "openai.com": 0.9,
+    "anthropic.com": 0.9,
+    "mistral.ai": 0.9,
+    "nvidia.com": 0.85,
+    "paperswithcode.com": 0.8,
+    "ollama.com": 0.7,
+    "kaggle.com": 0.6,
+    "wikipedia.org": 0.5,
+    "medium.com": 0.3,
+    "reddit.com": 0.3,
+    "x.com": 0.2,
+    "youtube.com": 0.1,
+}
+DEFAULT_SOURCE_AUTHORITY = 0.4
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+search_cache = get_cache("web_search", SEARCH_CACHE_TTL)
+
+BOILERPLATE_TAGS = [
+    "script",
+    "style",
+    "meta",
+    "link",
+    "noscript",
+    "svg",
+    "iframe",
+    "nav",
+    "footer",
+    "aside",
+    "form",
+    "button",
+]
+BOILERPLATE_ROLES = ["navigation", "banner", "contentinfo", "search", "dialog"]
+# Matched against whole class names and ids, so content containers such as
+# "shared-content" or "menu-example" are kept.
+BOILERPLATE_ATTRIBUTE_PATTERN = re.compile(
+    r"(cookie|consent|gdpr)([-_]?(banner|bar|notice|popup|modal|dialog))?"
+    r"|(site|page|global)[-_]?(header|footer|nav|navigation|menu)"
+    r"|(main|top|nav|mobile)[-_]?menu|menu|navbar|nav[-_]?bar"
+    r"|breadcrumbs?|sidebar|side[-_]?bar|footer"
+    r"|(share|social)([-_]?(bar|buttons?|links|icons|media))?"
+    r"|newsletter([-_]?(signup|form|box))?|subscribe([-_]?(form|box))?"
+    r"|ads?|advert(isement)?s?|ad[-_]?(banner|container|slot)|promo[-_]?(banner|bar)",
+    re.IGNORECASE,
+)
+# Headers inside these hold the content's own title, so only page-level
+# headers are stripped.
+CONTENT_CONTAINERS = ["main", "article", "section"]
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def source_authority(url: str) -> float:
+    host = urlsplit(url).hostname or ""
+    for domain, authority in SOURCE_AUTHORITY.items():
+        if host == domain or host.endswith(f".{domain}"):
+            return authority
+    return DEFAULT_SOURCE_AUTHORITY
+
+
+def link_relevance(model_id: str, text: str) -> float:
+    # Share of the model id's terms ("llama", "3", "2", "1b") that appear in
+    # the link or its search result title and snippet.
+    terms = set(_TERM_PATTERN.findall(model_id.lower()))
+    if not terms:
+        return 0.0
+    return len(terms & set(_TERM_PATTERN.findall(text.lower()))) / len(terms)
+
+
+def get_embeddings() -> Embeddings:
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = create_embeddings()
+    return _embeddings
+
+
+def embeddings_loaded() -> bool:
+    return _embeddings is not None
+
+
+def warm_up_embeddings() -> threading.Thread:
+    def warm_up():
+        try:
+            get_embeddings().embed_query("warm up")
+            logger.info("Embedding model warmed up")
+        except Exception as e:
+            logger.error(f"Embedding model warm up failed: {str(e)}")
+
+    thread = threading.Thread(target=warm_up, name="embeddings-warmup", daemon=True)
+    thread.start()
+    return thread
+
 
 class AgentService:
+    # Bump when a change to the pipeline should invalidate stored autofill runs.
+    PIPELINE_VERSION = 1
+
     def __init__(
         self,
         model_id: str,
         model_links: Optional[List[str]] = None,
-        doc_paths: Optional[List[str]] = None,
+        doc_sources: Optional[List[DocumentSource]] = None,
         use_scraping: bool = True,
         use_ddg: bool = False,
+        retrieval_profile: str = DEFAULT_RETRIEVAL_PROFILE,
     ):
+        if retrieval_profile not in RETRIEVAL_PROFILES:
+            raise ValueError(f"Unknown retrieval profile: {retrieval_profile}")
         self.model_id = model_id
         self.provided_links = model_links or []
-        self.doc_paths = doc_paths or []
+        self.doc_sources = doc_sources or []
         self.use_scraping = use_scraping
         self.use_ddg = use_ddg
+        self.retrieval_profile = retrieval_profile
+        self.stats = {"timings": {}}
 
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="BAAI/bge-small-en-v1.5", model_kwargs={"device": "cpu"}
-        )
+        self.embeddings = get_embeddings()
 
+        # The summary goes through the shared router; this model only
+        # writes query variants for the thorough retrieval profile.
+        self.router = get_router()
         self.llm = ChatGroq(
             temperature=0.1,
             model_name="meta-llama/llama-4-scout-17b-16e-instruct",
@@ -53,20 +193,40 @@ class AgentService:
         )
         logger.info(f"AgentService initialization completed for {self.model_id}")
 
+    @contextmanager
+    def _timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats["timings"][f"{stage}_seconds"] = round(
+                time.perf_counter() - start, 3
+            )
+
     def _scrape_webpage(self, url: str) -> str:
         try:
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             }
-            response = requests.get(url, headers=headers, timeout=10)
+            with track_call("http", "scrape"):
+                response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
 
             soup = BeautifulSoup(response.text, "html.parser")
 
-            for script in soup(["script", "style", "meta", "link"]):
+            for script in soup(BOILERPLATE_TAGS):
                 script.decompose()
-
-            text = soup.get_text(separator=" ", strip=True)
+            for header in soup.find_all("header"):
+                if header.find_parent(CONTENT_CONTAINERS) is None:
+                    header.decompose()
+            for element in soup.find_all(attrs={"role": BOILERPLATE_ROLES}):
+                element.decompose()
+            for element in soup.find_all(self._is_boilerplate_container):
+                element.decompose()
+
+            # Prefer the page's main content region when it declares one.
+            content_root = soup.find("main") or soup.find("article") or soup
+            text = content_root.get_text(separator=" ", strip=True)
             lines = [line.strip() for line in text.splitlines() if line.strip()]
             text = " ".join(lines)
 
@@ -75,98 +235,229 @@ class AgentService:
             logger.error(f"Failed to scrape {url}: {str(e)}")
             return ""
 
-    def _search_web(self) -> List[str]:
-        logger.info(f"Starting web search for model: {self.model_id}")
-        all_links = set(self.provided_links) if self.provided_links else set()
+    @staticmethod
+    def _is_boilerplate_container(tag) -> bool:
+        if tag.name in ("html", "body", "main", "article") or tag.attrs is None:
+            return False
+        tokens = list(tag.get("class") or []) + [tag.get("id") or ""]
+        return any(
+            BOILERPLATE_ATTRIBUTE_PATTERN.fullmatch(token) for token in tokens if token
+        )
 
-        if self.use_ddg:
-            try:
-                logger.debug("Performing DuckDuckGo search")
+    def _search_results(self) -> List[Dict]:
+        # DuckDuckGo results are shared by every autofill of the same model
+        # until SEARCH_CACHE_TTL expires; failed searches are not cached.
+        cache_key = hashlib.sha256(
+            self.model_id.strip().lower().encode("utf-8")
+        ).hexdigest()
+        results = search_cache.get(cache_key)
+        self.stats["links"]["search_cache_hit"] = results is not None
+        if results is not None:
+            return results
+        try:
+            logger.debug("Performing DuckDuckGo search")
+            with track_call("duckduckgo", "search"):
                 search_results = self.search_tool.run(
                     f"{self.model_id} machine learning model technical details documentation"
                 )
-                search_links = {result["link"] for result in search_results}
-                all_links.update(search_links)
-                logger.info(f"Found {len(search_links)} links from DuckDuckGo search")
-            except Exception as e:
-                logger.warning(f"DuckDuckGo search failed: {str(e)}")
-
-        if not all_links:
-            if not self.provided_links:
-                logger.warning(
-                    "No links available - neither provided links nor DuckDuckGo search results"
-                )
-                raise ValueError("No links available for processing")
-            logger.info("Using only provided links")
+            results = [
+                {
+                    "link": result["link"],
+                    "title": result.get("title", ""),
+                    "snippet": result.get("snippet", ""),
+                }
+                for result in search_results
+            ]
+            search_cache.set(cache_key, results)
+            logger.info(f"Found {len(results)} links from DuckDuckGo search")
+            return results
+        except Exception as e:
+            logger.warning(f"DuckDuckGo search failed: {str(e)}")
+            return []
 
-        return list(all_links)
+    def _search_web(self) -> List[str]:
+        logger.info(f"Starting web search for model: {self.model_id}")
+        self.stats["links"] = {}
+        candidates = [
+            {"link": link, "title": "", "snippet": "", "provided": True}
+            for link in self.provided_links
+        ]
+        if self.use_ddg:
+            candidates.extend(
+                {**result, "provided": False} for result in self._search_results()
+            )
+
+        # Provided links win duplicates, and canonical forms merge tracking
+        # variants and mirrors of one page.
+        unique = {}
+        for candidate in candidates:
+            url = canonicalize_url(candidate["link"])
+            if url not in unique:
+                unique[url] = candidate
+
+        if not unique:
+            logger.warning(
+                "No links available - neither provided links nor DuckDuckGo search results"
+            )
+            raise ValueError("No links available for processing")
+
+        def score(url: str) -> float:
+            candidate = unique[url]
+            text = f"{url} {candidate['title']} {candidate['snippet']}"
+            return source_authority(url) + link_relevance(self.model_id, text)
+
+        # Every provided link, then the best search results up to MAX_LINKS,
+        # each group by authority plus relevance. Canonical forms are only
+        # keys: the link is fetched as given, since a canonical form may not
+        # serve the same page (http-only hosts, no apex record, signed query).
+        ranked = sorted(
+            unique, key=lambda url: (not unique[url]["provided"], -score(url))
+        )
+        provided = sum(candidate["provided"] for candidate in unique.values())
+        links = [unique[url]["link"] for url in ranked[: max(provided, MAX_LINKS)]]
+        self.stats["links"].update(
+            {
+                "candidates": len(candidates),
+                "unique": len(unique),
+                "selected": len(links),
+            }
+        )
+        logger.info(f"Selected {len(links)} of {len(unique)} unique links")
+        return links
+
+    def _load_web_page(self, url: str) -> List[Document]:
+        try:
+            if self.use_scraping:
+                content = self._scrape_webpage(url)
+                documents = (
+                    [Document(page_content=content, metadata={"source": url})]
+                    if content
+                    else []
+                )
+            else:
+                documents = WebBaseLoader([url]).load()
+            logger.debug("Successfully processed content from %s", url)
+            return documents
+        except Exception as e:
+            logger.error(f"Failed to process content from {url}: {str(e)}")
+            return []
 
     def _process_web_content(self, links: List[str]) -> List[Document]:
+        if not links:
+            return []
+        # Pages are fetched concurrently in ranked batches; results keep the
+        # order of links, and lower ranked batches are skipped once the
+        # token budget is spent.
+        batch_size = min(MAX_SCRAPE_WORKERS, len(links))
         documents = []
-        for url in links:
-            try:
-                if self.use_scraping:
-                    content = self._scrape_webpage(url)
-                    if content:
-                        doc = Document(page_content=content, metadata={"source": url})
-                        documents.append(doc)
-                else:
-                    web_loader = WebBaseLoader([url])
-                    documents.extend(web_loader.load())
-                logger.debug(f"Successfully processed content from {url}")
-            except Exception as e:
-                logger.error(f"Failed to process content from {url}: {str(e)}")
+        fetched = 0
+        tokens = 0
+        with ThreadPoolExecutor(
+            max_workers=batch_size, thread_name_prefix="scrape"
+        ) as executor:
+            for start in range(0, len(links), batch_size):
+                if WEB_TOKEN_BUDGET and tokens >= WEB_TOKEN_BUDGET:
+                    logger.info(
+                        f"Token budget reached, skipping {len(links) - start} links"
+                    )
+                    break
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self._load_web_page, url
+                    )
+                    for url in links[start : start + batch_size]
+                ]
+                for future in futures:
+                    for document in future.result():
+                        documents.append(document)
+                        tokens += len(document.page_content) // CHARS_PER_TOKEN
+                fetched += len(futures)
+        self.stats.setdefault("links", {}).update(
+            {"fetched": fetched, "estimated_tokens": tokens}
+        )
         return documents
 
-    def _load_local_documents(self) -> List[Any]:
-        logger.info(f"Loading local documents from {len(self.doc_paths)} paths")
-        documents = []
-        for path in self.doc_paths:
-            try:
-                ext = os.path.splitext(path)[1].lower()
-                logger.debug(f"Processing document: {path} with extension {ext}")
-                if ext == ".pdf":
-                    loader = PyPDFLoader(path)
-                elif ext in [".doc", ".docx"]:
-                    loader = UnstructuredWordDocumentLoader(path)
-                else:
-                    logger.warning(f"Unsupported file extension: {ext} for file {path}")
-                    continue
-                loaded_docs = loader.load()
-                documents.extend(loaded_docs)
-                logger.debug(
-                    f"Successfully loaded {len(loaded_docs)} pages from {path}"
+    def _load_local_documents(self) -> List[Document]:
+        logger.info(f"Loading {len(self.doc_sources)} local documents")
+        chunks = []
+        self.stats["documents"] = []
+        for result in parse_documents(self.doc_sources):
+            if result["error"]:
+                logger.error(
+                    f"Failed to load document {result['file']}: {result['error']}"
                 )
-            except Exception as e:
-                logger.error(f"Failed to load document {path}: {str(e)}")
-        logger.info(f"Total documents loaded: {len(documents)}")
-        return documents
-
-    def _create_vectorstore(self, documents) -> FAISS:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""],
+            elif result["truncated"] or result["timed_out"]:
+                logger.warning(
+                    f"Stopped parsing {result['file']} after {result['pages']} pages"
+                )
+            file_chunks = result.pop("chunks")
+            chunks.extend(
+                Document(page_content=text, metadata=metadata)
+                for text, metadata in file_chunks
+            )
+            self.stats["documents"].append({**result, "chunks": len(file_chunks)})
+        logger.info(f"Total document chunks loaded: {len(chunks)}")
+        return chunks
+
+    def _split_documents(
+        self, documents: List[Document], presplit: List[Document]
+    ) -> List[Document]:
+        # Uploaded files arrive already split by the parser workers.
+        splits = create_text_splitter().split_documents(documents) + presplit
+
+        dedup_stats = {"input_chunks": len(splits), "dropped_chunks": 0}
+        if DEDUP_ENABLED:
+            splits, dedup_stats = deduplicate_documents(splits, NEAR_DUPLICATE_DISTANCE)
+            logger.info(
+                f"Dropped {dedup_stats['dropped_chunks']} of "
+                f"{dedup_stats['input_chunks']} chunks as duplicates"
+            )
+        self.stats["dedup"] = dedup_stats
+        return splits
+
+    def _create_vectorstore(self, splits: List[Document]) -> FAISS:
+        dedup_stats = self.stats["dedup"]
+        start = time.perf_counter()
+        with track_call("embeddings", "embed_documents"):
+            vectorstore = FAISS.from_documents(splits, self.embeddings)
+        embedding_seconds = time.perf_counter() - start
+
+        # Saved time is estimated from the measured per-chunk embedding cost.
+        per_chunk_seconds = embedding_seconds / len(splits) if splits else 0.0
+        dedup_stats["embedding_seconds"] = round(embedding_seconds, 3)
+        dedup_stats["estimated_embedding_seconds_saved"] = round(
+            per_chunk_seconds * dedup_stats["dropped_chunks"], 3
         )
-        splits = text_splitter.split_documents(documents)
-
-        vectorstore = FAISS.from_documents(splits, self.embeddings)
         logger.info("Vector store creation completed")
         return vectorstore
 
-    def _setup_rag_pipeline(self, vectorstore):
+    def _build_retriever(self, vectorstore: FAISS, splits: List[Document]):
         base_retriever = vectorstore.as_retriever(
-            search_type="similarity", search_kwargs={"k": 4}
+            search_type="similarity", search_kwargs={"k": RETRIEVAL_K}
         )
+        if self.retrieval_profile == "fast":
+            return base_retriever
+
+        if self.retrieval_profile == "balanced":
+            keyword_retriever = BM25Retriever.from_documents(splits, k=RETRIEVAL_K)
+            return EnsembleRetriever(
+                retrievers=[base_retriever, keyword_retriever], weights=[0.5, 0.5]
+            )
 
         multi_retriever = MultiQueryRetriever.from_llm(
             retriever=base_retriever, llm=self.llm
         )
-
-        ensemble_retriever = EnsembleRetriever(
+        return EnsembleRetriever(
             retrievers=[base_retriever, multi_retriever], weights=[0.5, 0.5]
         )
 
+    def _retrieve(self, retriever) -> List[Document]:
+        if self.retrieval_profile == "thorough":
+            with track_call("groq", "multi_query"):
+                return retriever.invoke(self.model_id)
+        return retriever.invoke(self.model_id)
+
+    def _setup_rag_pipeline(self):
         template = """You are an AI assistant tasked with providing accurate information about machine learning models.
         Use the following retrieved context to answer questions about the model {model_id}.
         
@@ -182,40 +473,14 @@ class AgentService:
         
         Summary:"""
 
-        prompt = ChatPromptTemplate.from_template(template)
-
-        chain = (
-            {"context": ensemble_retriever, "model_id": RunnablePassthrough()}
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-
         logger.info("RAG pipeline setup completed")
-        return chain
+        return PromptTemplate.from_template(template)
 
     def run_agent(self) -> str:
         logger.info(f"Starting agent run for model: {self.model_id}")
         try:
-            links = self._search_web()
-            documents = []
-
-            if links:
-                logger.debug(f"Loading web documents from {len(links)} links")
-                documents.extend(self._process_web_content(links))
-
-            local_docs = self._load_local_documents()
-            documents.extend(local_docs)
-
-            if not documents:
-                logger.error("No documents were successfully loaded")
-                raise ValueError("No documents were successfully loaded")
-
-            vectorstore = self._create_vectorstore(documents)
-            chain = self._setup_rag_pipeline(vectorstore)
-
-            logger.debug("Executing RAG chain")
-            response = chain.invoke(self.model_id)
+            with self._timed("total"):
+                response = self._run_pipeline()
             logger.info("Agent run completed successfully")
 
             return response
@@ -224,6 +489,57 @@ class AgentService:
             logger.error(f"Agent run failed: {str(e)}")
             raise Exception(f"Error in RAG pipeline: {str(e)}")
 
+    def _run_pipeline(self) -> str:
+        with self._timed("search"):
+            links = self._search_web()
+        documents = []
+
+        with self._timed("load"):
+            if links:
+                logger.debug("Loading web documents from %d links", len(links))
+                documents.extend(self._process_web_content(links))
+
+            local_chunks = self._load_local_documents()
+
+        if not documents and not local_chunks:
+            logger.error("No documents were successfully loaded")
+            raise ValueError("No documents were successfully loaded")
+
+        with self._timed("split"):
+            splits = self._split_documents(documents, local_chunks)
+        with self._timed("index"):
+            vectorstore = self._create_vectorstore(splits)
+            retriever = self._build_retriever(vectorstore, splits)
+
+        with self._timed("retrieval"):
+            context_documents = self._retrieve(retriever)
+        self.stats["retrieval"] = {
+            "profile": self.retrieval_profile,
+            "documents": len(context_documents),
+            "llm_calls": 2 if self.retrieval_profile == "thorough" else 1,
+        }
+        logger.debug(
+            "Retrieved %d chunks with the %s profile",
+            len(context_documents),
+            self.retrieval_profile,
+        )
+
+        prompt = self._setup_rag_pipeline().format(
+            context="\n\n".join(
+                document.page_content for document in context_documents
+            ),
+            model_id=self.model_id,
+        )
+        logger.debug("Generating the summary")
+        with self._timed("generation"):
+            completion = self.router.complete("autofill", prompt)
+        self.stats["generation"] = {
+            "model": f"{completion.provider}:{completion.model}",
+            "input_tokens": completion.input_tokens,
+            "output_tokens": completion.output_tokens,
+        }
+        return completion.text
+
 
 if __name__ == "__main__":
     logger.info("Starting agent service test run")
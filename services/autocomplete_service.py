@@ -0,0 +1,141 @@
+import bisect
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from models.models import ModelEntry
+from services.catalog_stats_service import cached_catalog_stats
+
+load_dotenv()
+
+# Autocomplete field -> key of its counts in catalog_stats.
+AUTOCOMPLETE_FIELDS = {
+    "tags": "by_tag",
+    "developer": "by_developer",
+    "model_type": "by_model_type",
+    "license": "by_license",
+}
+AUTOCOMPLETE_MAX_USERS = int(os.getenv("AUTOCOMPLETE_MAX_USERS", 1000))
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def model_field_values(model: ModelEntry) -> Dict[str, List[str]]:
+    # Tags are counted per occurrence, as unnest() does in catalog_stats.
+    values = {"tags": list(model.tags or [])}
+    for field in ("developer", "model_type", "license"):
+        value = getattr(model, field)
+        values[field] = [value] if value else []
+    return values
+
+
+class _PrefixIndex:
+    # Distinct values of one field, sorted by casefolded value so that every
+    # match for a prefix is one contiguous bisect range.
+    def __init__(self, counts: Iterable[Dict[str, Any]]):
+        self.counts: Dict[str, int] = {}
+        self.keys: List[tuple] = []
+        for entry in counts:
+            if entry["value"]:
+                self.counts[entry["value"]] = entry["count"]
+                self.keys.append((entry["value"].casefold(), entry["value"]))
+        self.keys.sort()
+
+    def add(self, value: str, amount: int):
+        count = self.counts.get(value, 0) + amount
+        key = (value.casefold(), value)
+        if count > 0:
+            if value not in self.counts:
+                bisect.insort(self.keys, key)
+            self.counts[value] = count
+        elif value in self.counts:
+            del self.counts[value]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def lookup(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.keys, (prefix,))
+        # Every key starting with the prefix sorts below prefix + U+10FFFF.
+        end = bisect.bisect_left(self.keys, (prefix + "\U0010ffff",), start)
+        matches = heapq.nsmallest(
+            limit,
+            (key[1] for key in self.keys[start:end]),
+            key=lambda value: (-self.counts[value], value.casefold()),
+        )
+        return [{"value": value, "count": self.counts[value]} for value in matches]
+
+
+class _UserIndex:
+    def __init__(self, user_id: int, catalog_version: int):
+        self.catalog_version = catalog_version
+        stats = cached_catalog_stats(user_id, catalog_version)
+        self.fields = {
+            field: _PrefixIndex(stats[key])
+            for field, key in AUTOCOMPLETE_FIELDS.items()
+        }
+
+
+class AutocompleteIndex:
+    # Built lazily per user and tied to the catalog_version it reflects.
+    # Writes in this worker patch it in place; a version moved by any other
+    # writer makes the next lookup rebuild it.
+    def __init__(self, max_users: int = AUTOCOMPLETE_MAX_USERS):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def suggest(
+        self,
+        user_id: int,
+        catalog_version: int,
+        field: str,
+        prefix: str,
+        limit: int = AUTOCOMPLETE_DEFAULT_LIMIT,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and index.catalog_version == catalog_version:
+                self._users.move_to_end(user_id)
+                return index.fields[field].lookup(prefix, limit)
+
+        # Built outside the lock; a concurrent build for the same user is
+        # harmless, the last one stored wins.
+        index = _UserIndex(user_id, catalog_version)
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return index.fields[field].lookup(prefix, limit)
+
+    def apply(
+        self,
+        user_id: int,
+        version_before: int,
+        version_after: int,
+        removed: Optional[Dict[str, List[str]]] = None,
+        added: Optional[Dict[str, List[str]]] = None,
+    ):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                return
+            # Only a single write by this worker since the index was built
+            # can be patched; anything else is unknown, so rebuild later.
+            if (
+                index.catalog_version != version_before
+                or version_after != version_before + 1
+            ):
+                del self._users[user_id]
+                return
+            for values, amount in ((removed or {}, -1), (added or {}, 1)):
+                for field, field_values in values.items():
+                    for value in field_values:
+                        index.fields[field].add(value, amount)
+            index.catalog_version = version_after
+
+    def discard(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+from models.models import AutofillRun, session
+from services.agent_service import AgentService
+from services.llm_router import get_router
+from utils.urls import canonicalize_url
+
+load_dotenv()
+
+# How long a stored run answers repeated requests, in seconds; 0 keeps
+# serving it until the caller forces a refresh or the pipeline changes.
+AUTOFILL_RESULT_TTL = float(os.getenv("AUTOFILL_RESULT_TTL", 30 * 24 * 60 * 60))
+AUTOFILL_HISTORY_DEFAULT_LIMIT = 20
+AUTOFILL_HISTORY_MAX_LIMIT = 100
+
+
+def pipeline_version() -> str:
+    # Changes with the pipeline code and with the models autofill can use.
+    return f"{AgentService.PIPELINE_VERSION}:{get_router().signature('autofill')}"
+
+
+def autofill_fingerprint(
+    model_id: str,
+    links: List[str],
+    file_hashes: List[str],
+    retrieval_profile: str,
+    version: str,
+) -> str:
+    # Links are compared in canonical form and, like the files, in any order.
+    fingerprint = json.dumps(
+        [
+            version,
+            (model_id or "").strip(),
+            sorted({canonicalize_url(link) for link in links if link.strip()}),
+            sorted(file_hashes),
+            retrieval_profile,
+        ]
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def load_latest_run(
+    user_id: int, fingerprint: str, max_age: float = AUTOFILL_RESULT_TTL
+) -> Optional[AutofillRun]:
+    query = select(AutofillRun).where(
+        AutofillRun.user_id == user_id, AutofillRun.fingerprint == fingerprint
+    )
+    if max_age > 0:
+        query = query.where(
+            AutofillRun.created_at >= datetime.utcnow() - timedelta(seconds=max_age)
+        )
+    return session.scalars(query.order_by(AutofillRun.id.desc()).limit(1)).first()
+
+
+def store_run(
+    user_id: int,
+    fingerprint: str,
+    model_id: str,
+    links: List[str],
+    files: List[Tuple[str, str]],
+    retrieval_profile: str,
+    version: str,
+    result: Dict[str, Any],
+) -> AutofillRun:
+    # files are (name, sha256) pairs.
+    files = sorted(files, key=lambda file: file[1])
+    run = AutofillRun(
+        user_id=user_id,
+        fingerprint=fingerprint,
+        model_id=model_id,
+        links=list(links),
+        file_names=[name for name, _ in files],
+        file_hashes=[sha256 for _, sha256 in files],
+        retrieval_profile=retrieval_profile,
+        pipeline_version=version,
+        response=result["response"],
+        stats=result["stats"],
+    )
+    try:
+        session.add(run)
+        session.commit()
+        return run
+    except Exception:
+        session.rollback()
+        raise
+
+
+def list_runs(
+    user_id: int,
+    model_id: Optional[str] = None,
+    before: Optional[int] = None,
+    limit: int = AUTOFILL_HISTORY_DEFAULT_LIMIT,
+) -> List[AutofillRun]:
+    # Newest first; pass the last run_id of a page as before for the next.
+    query = select(AutofillRun).where(AutofillRun.user_id == user_id)
+    if model_id:
+        query = query.where(AutofillRun.model_id == model_id.strip())
+    if before is not None:
+        query = query.where(AutofillRun.id < before)
+    return list(
+        session.scalars(query.order_by(AutofillRun.id.desc()).limit(limit)).all()
+    )
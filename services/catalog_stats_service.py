@@ -0,0 +1,69 @@
+from typing import Any, Dict
+from sqlalchemy import func, literal, select, tuple_
+from models.models import ModelEntry, session
+from utils.cache import get_cache
+
+# Reported dimensions, as response key suffix -> column.
+STATS_DIMENSIONS = {
+    "status": ModelEntry.status,
+    "model_type": ModelEntry.model_type,
+    "license": ModelEntry.license,
+    "developer": ModelEntry.developer,
+}
+
+# Keyed by user and catalog_version, so writes never serve stale counts.
+stats_cache = get_cache("catalog_stats")
+
+
+def catalog_stats(user_id: int) -> Dict[str, Any]:
+    columns = list(STATS_DIMENSIONS.values())
+    # One pass over the user's rows: a grouping set per dimension plus the
+    # empty set for the total. grouping() tells which set a row belongs to.
+    rows = session.execute(
+        select(
+            *columns,
+            *[func.grouping(column) for column in columns],
+            func.count(),
+        )
+        .where(ModelEntry.user_id == user_id)
+        .group_by(func.grouping_sets(*columns, tuple_()))
+    ).all()
+    stats = {"total": 0, **{f"by_{name}": [] for name in STATS_DIMENSIONS}}
+    for row in rows:
+        values, grouped, count = (
+            row[: len(columns)],
+            row[len(columns) : -1],
+            row[-1],
+        )
+        if all(grouped):
+            stats["total"] = count
+            continue
+        index = grouped.index(0)
+        stats[f"by_{list(STATS_DIMENSIONS)[index]}"].append(
+            {"value": values[index], "count": count}
+        )
+
+    tag = func.unnest(ModelEntry.tags).table_valued("tag").render_derived()
+    stats["by_tag"] = [
+        {"value": value, "count": count}
+        for value, count in session.execute(
+            select(tag.c.tag, func.count())
+            .select_from(ModelEntry)
+            .join(tag, literal(True))
+            .where(ModelEntry.user_id == user_id)
+            .group_by(tag.c.tag)
+        )
+    ]
+    for key, counts in stats.items():
+        if key != "total":
+            counts.sort(key=lambda entry: (-entry["count"], str(entry["value"])))
+    return stats
+
+
+def cached_catalog_stats(user_id: int, catalog_version: int) -> Dict[str, Any]:
+    cache_key = f"{user_id}:{catalog_version}"
+    stats = stats_cache.get(cache_key)
+    if stats is None:
+        stats = catalog_stats(user_id)
+        stats_cache.set(cache_key, stats)
+    return stats
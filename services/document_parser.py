@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from services.document_worker import empty_result, parse_to_pipe
+from utils.uploads import DocumentSource
+
+load_dotenv()
+
+DOC_PARSE_WORKERS = int(
+    os.getenv("AUTOFILL_DOC_PARSE_WORKERS", min(4, os.cpu_count() or 1))
+)
+DOC_PARSE_TIMEOUT = float(os.getenv("AUTOFILL_DOC_PARSE_TIMEOUT", 60))
+DOC_MAX_PAGES = int(os.getenv("AUTOFILL_DOC_MAX_PAGES", 300))
+DOC_MAX_CHARS = int(os.getenv("AUTOFILL_DOC_MAX_CHARS", 1_000_000))
+DOC_PARSE_KILL_GRACE = 5
+# Forking the threaded server process could copy a lock held by another thread
+# (logging, malloc, tokenizers) into the worker, so workers are forked from a
+# single-threaded forkserver that has only services.document_worker loaded.
+DOC_PARSE_START_METHOD = os.getenv("AUTOFILL_DOC_PARSE_START_METHOD", "forkserver")
+_context = multiprocessing.get_context(DOC_PARSE_START_METHOD)
+if DOC_PARSE_START_METHOD == "forkserver":
+    _context.set_forkserver_preload(["services.document_worker"])
+
+
+def _parse_in_subprocess(
+    source: DocumentSource, max_pages: int, max_chars: int, timeout: float
+) -> Dict[str, Any]:
+    receiver, sender = _context.Pipe(duplex=False)
+    process = _context.Process(
+        target=parse_to_pipe,
+        args=(sender, source, max_pages, max_chars, timeout),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    try:
+        # The worker stops between pages at its own deadline; the grace period
+        # only expires when a single page hangs, and the process is killed.
+        if receiver.poll(timeout + DOC_PARSE_KILL_GRACE):
+            return receiver.recv()
+        return empty_result(source, f"parsing exceeded {timeout}s", timed_out=True)
+    except EOFError:
+        process.join()
+        return empty_result(source, f"parser exited with code {process.exitcode}")
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+
+def parse_documents(
+    sources: List[DocumentSource],
+    max_pages: int = DOC_MAX_PAGES,
+    max_chars: int = DOC_MAX_CHARS,
+    timeout: float = DOC_PARSE_TIMEOUT,
+    workers: int = DOC_PARSE_WORKERS,
+) -> List[Dict[str, Any]]:
+    if not sources:
+        return []
+
+    # Each file gets its own process, so a stuck file can be killed without
+    # touching the others; the threads only supervise up to `workers` at once.
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(workers, len(sources))),
+        thread_name_prefix="doc-parse",
+    ) as executor:
+        return list(
+            executor.map(
+                lambda source: _parse_in_subprocess(
+                    source, max_pages, max_chars, timeout
+                ),
+                sources,
+            )
+        )
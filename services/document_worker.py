@@ -0,0 +1,135 @@
+import io
+import os
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Iterator, Tuple, Union
+import docx
+from pypdf import PdfReader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Parsing code run inside document parser processes. The forkserver preloads
+# this module, so it must stay light and must not start threads: no Flask,
+# no app modules, no utils.logging (its listener thread would be inherited by
+# every forked worker).
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+CHUNK_SEPARATORS = ["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+# Word documents have no pages; paragraphs are grouped into sections this size.
+DOCX_SECTION_CHARS = 4000
+
+# utils.uploads.DocumentSource, not imported to keep Flask out of the workers.
+DocumentSource = Union[str, Tuple[str, bytes]]
+
+
+def create_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=CHUNK_SEPARATORS,
+    )
+
+
+def _iter_pdf_pages(
+    document: Union[str, BinaryIO], name: str
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    reader = PdfReader(document)
+    for page_number, page in enumerate(reader.pages):
+        yield page.extract_text() or "", {"source": name, "page": page_number}
+
+
+def _iter_docx_sections(
+    document: Union[str, BinaryIO], name: str
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    section, section_chars, section_number = [], 0, 0
+    for paragraph in docx.Document(document).paragraphs:
+        if not paragraph.text.strip():
+            continue
+        section.append(paragraph.text)
+        section_chars += len(paragraph.text)
+        if section_chars >= DOCX_SECTION_CHARS:
+            yield "\n\n".join(section), {"source": name, "page": section_number}
+            section, section_chars, section_number = [], 0, section_number + 1
+    if section:
+        yield "\n\n".join(section), {"source": name, "page": section_number}
+
+
+def _iter_doc_sections(
+    document: Union[str, BinaryIO], name: str
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    # Legacy .doc needs unstructured (and LibreOffice), which only reads paths.
+    from langchain_community.document_loaders import UnstructuredWordDocumentLoader
+
+    with tempfile.TemporaryDirectory() as directory:
+        if not isinstance(document, str):
+            path = os.path.join(directory, name)
+            with open(path, "wb") as f:
+                f.write(document.read())
+            document = path
+        for section_number, section in enumerate(
+            UnstructuredWordDocumentLoader(document).lazy_load()
+        ):
+            yield section.page_content, {"source": name, "page": section_number}
+
+
+def _source_name(source: DocumentSource) -> str:
+    return os.path.basename(source) if isinstance(source, str) else source[0]
+
+
+def empty_result(
+    source: DocumentSource, error: str = None, timed_out: bool = False
+) -> Dict[str, Any]:
+    return {
+        "file": _source_name(source),
+        "pages": 0,
+        "chars": 0,
+        "chunks": [],
+        "truncated": False,
+        "timed_out": timed_out,
+        "error": error,
+    }
+
+
+def parse_document(
+    source: DocumentSource, max_pages: int, max_chars: int, timeout: float
+) -> Dict[str, Any]:
+    # Runs in a worker process: pages are read one at a time and split as they
+    # arrive, so only the chunks (never the whole file's text) are held.
+    name = _source_name(source)
+    document = source if isinstance(source, str) else io.BytesIO(source[1])
+    ext = os.path.splitext(name)[1].lower()
+    readers = {
+        ".pdf": _iter_pdf_pages,
+        ".docx": _iter_docx_sections,
+        ".doc": _iter_doc_sections,
+    }
+    if ext not in readers:
+        return empty_result(source, f"Unsupported file extension: {ext}")
+
+    result = empty_result(source)
+    text_splitter = create_text_splitter()
+    deadline = time.monotonic() + timeout
+    try:
+        for text, metadata in readers[ext](document, name):
+            if result["pages"] >= max_pages or result["chars"] >= max_chars:
+                result["truncated"] = True
+                break
+            if time.monotonic() > deadline:
+                result["timed_out"] = True
+                break
+            text = text[: max_chars - result["chars"]]
+            result["pages"] += 1
+            result["chars"] += len(text)
+            result["chunks"].extend(
+                (chunk, metadata) for chunk in text_splitter.split_text(text)
+            )
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def parse_to_pipe(
+    sender, source: DocumentSource, max_pages: int, max_chars: int, timeout: float
+):
+    sender.send(parse_document(source, max_pages, max_chars, timeout))
+    sender.close()
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+from typing import List
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from utils.logging import logger
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", os.cpu_count() or 1))
+EMBEDDING_ONNX_PATH = os.getenv(
+    "EMBEDDING_ONNX_PATH", os.path.join("onnx_models", "bge-small-en-v1.5")
+)
+EMBEDDING_ONNX_QUANTIZED = (
+    os.getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() == "true"
+)
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+class OnnxEmbeddings(Embeddings):
+    # bge-small-en-v1.5 pools the [CLS] token and L2-normalizes, matching the
+    # sentence-transformers pipeline used by the torch backend.
+    def __init__(
+        self,
+        model_dir: str = EMBEDDING_ONNX_PATH,
+        quantized: bool = EMBEDDING_ONNX_QUANTIZED,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        num_threads: int = EMBEDDING_THREADS,
+        max_length: int = 512,
+    ):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = Path(model_dir) / (
+            ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        )
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX embedding model not found at {model_path}; "
+                "run python -m scripts.export_onnx_embeddings first"
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(
+                texts[start : start + self.batch_size]
+            )
+            input_ids = np.array(
+                [encoding.ids for encoding in encodings], dtype=np.int64
+            )
+            feeds = {
+                "input_ids": input_ids,
+                "attention_mask": np.array(
+                    [encoding.attention_mask for encoding in encodings], dtype=np.int64
+                ),
+            }
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            last_hidden_state = self.session.run(None, feeds)[0]
+            pooled = last_hidden_state[:, 0]
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            vectors.extend((pooled / np.clip(norms, 1e-12, None)).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    logger.info(f"Loading {backend} embedding backend for {EMBEDDING_MODEL_NAME}")
+    if backend == "onnx":
+        return OnnxEmbeddings()
+    if backend == "torch":
+        import torch
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        torch.set_num_threads(EMBEDDING_THREADS)
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE},
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Dict, Any
+from sqlalchemy import text
+from dotenv import load_dotenv
+from models.models import engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from services.agent_service import embeddings_loaded
+from utils.logging import logger
+
+load_dotenv()
+
+
+class HealthService:
+    def __init__(self):
+        self.db_timeout = float(os.getenv("READINESS_DB_TIMEOUT", 1.0))
+        self.max_pool_saturation = float(
+            os.getenv("READINESS_MAX_POOL_SATURATION", 0.9)
+        )
+        self.cache_seconds = float(os.getenv("READINESS_CACHE_SECONDS", 5))
+        self.require_warm_models = (
+            os.getenv("WARM_MODELS_ON_STARTUP", "false").lower() == "true"
+        )
+        # A single probe thread: a hung connection attempt can't pile up threads.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="readiness"
+        )
+        self._lock = threading.Lock()
+        self._cached_result = None
+        self._cached_at = 0.0
+
+    def check_readiness(self) -> Dict[str, Any]:
+        with self._lock:
+            if (
+                self._cached_result is not None
+                and time.monotonic() - self._cached_at < self.cache_seconds
+            ):
+                return self._cached_result
+
+            checks = {
+                "database_pool": self._check_pool(),
+                "database": self._check_database(),
+                "models": self._check_models(),
+            }
+            result = {
+                "ready": all(check["ok"] for check in checks.values()),
+                "checks": checks,
+            }
+            if not result["ready"]:
+                logger.warning(f"Readiness check failed: {checks}")
+            self._cached_result = result
+            self._cached_at = time.monotonic()
+            return result
+
+    def _check_pool(self) -> Dict[str, Any]:
+        capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+        checked_out = engine.pool.checkedout()
+        saturation = checked_out / capacity if capacity else 0.0
+        return {
+            "ok": saturation < self.max_pool_saturation,
+            "checked_out": checked_out,
+            "capacity": capacity,
+            "saturation": round(saturation, 3),
+        }
+
+    def _check_database(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        future = self._executor.submit(self._ping_database)
+        try:
+            future.result(timeout=self.db_timeout)
+            return {
+                "ok": True,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+        except TimeoutError:
+            return {"ok": False, "error": f"timed out after {self.db_timeout}s"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _ping_database(self):
+        with engine.connect() as connection:
+            if engine.dialect.name == "postgresql":
+                connection.execute(
+                    text(f"SET LOCAL statement_timeout = {int(self.db_timeout * 1000)}")
+                )
+            connection.execute(text("SELECT 1"))
+
+    def _check_models(self) -> Dict[str, Any]:
+        loaded = embeddings_loaded()
+        return {
+            "ok": loaded or not self.require_warm_models,
+            "embeddings_loaded": loaded,
+        }
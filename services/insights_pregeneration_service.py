@@ -0,0 +1,131 @@
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.dialects.postgresql import insert
+from models.models import ModelEntry, ModelInsight, session
+from services.model_insights_service import GENERATION_ERROR, ModelInsightsService
+from utils.logging import logger
+from utils.debounce import DebouncedRunner
+from utils.singleflight import SingleFlight
+
+load_dotenv()
+
+PREGENERATE_ENABLED = (
+    os.getenv("INSIGHTS_PREGENERATE_ENABLED", "true").lower() == "true"
+)
+PREGENERATE_DELAY = float(os.getenv("INSIGHTS_PREGENERATE_DELAY", 30))
+PREGENERATE_CONCURRENCY = int(os.getenv("INSIGHTS_PREGENERATE_CONCURRENCY", 2))
+
+
+def load_stored_insights(content_hash: str) -> Optional[Dict[str, Any]]:
+    stored = session.get(ModelInsight, content_hash)
+    return dict(stored.sections) if stored else None
+
+
+def store_insights(content_hash: str, insights: Dict[str, Any]):
+    try:
+        session.execute(
+            insert(ModelInsight)
+            .values(content_hash=content_hash, sections=insights)
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+
+class InsightsPregenerator:
+    def __init__(
+        self,
+        insights_service: ModelInsightsService,
+        flight: SingleFlight,
+        delay: float = PREGENERATE_DELAY,
+        concurrency: int = PREGENERATE_CONCURRENCY,
+    ):
+        self.insights_service = insights_service
+        self.flight = flight
+        # Rescheduling a pending model pushes its run back (debounce); the
+        # pool caps concurrent generations, each making three LLM calls.
+        self._runner = DebouncedRunner(
+            self.pregenerate, delay, concurrency, "insights-pregen"
+        )
+
+    def schedule(self, model_id: int):
+        if PREGENERATE_ENABLED:
+            self._runner.schedule(model_id)
+
+    def cancel(self, model_id: int):
+        self._runner.cancel(model_id)
+
+    def pregenerate(self, model_id: int) -> bool:
+        # Runs on executor threads, which get their own scoped session.
+        try:
+            model = session.get(ModelEntry, model_id)
+            if model is None:
+                return False
+            model_data = model.to_dict()
+            content_hash = self.insights_service.content_hash(model_data)
+            if load_stored_insights(content_hash) is not None:
+                return False
+            session.close()
+
+            logger.info(f"Pregenerating insights for model {model_id}")
+            self.flight.do(
+                ("insights", model_id, content_hash, None),
+                self.generate_and_store,
+                model_data,
+                content_hash,
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to pregenerate insights for model {model_id}: {e}")
+            return False
+        finally:
+            session.remove()
+
+    def generate_and_store(
+        self, model_data: Dict[str, Any], content_hash: str
+    ) -> Dict[str, Any]:
+        insights = self.insights_service.generate_model_insights(model_data)
+        # Sections that failed are returned to the caller but never persisted.
+        if GENERATION_ERROR in insights.values():
+            logger.warning(
+                f"Not storing insights for model {model_data.get('id')}: "
+                "a section failed to generate"
+            )
+        else:
+            store_insights(content_hash, insights)
+        return insights
+
+
+def find_models_missing_insights(
+    insights_service: ModelInsightsService,
+) -> Tuple[List[int], Set[str]]:
+    # Returns the models without stored insights, and every current hash.
+    stored_hashes = {
+        content_hash for (content_hash,) in session.query(ModelInsight.content_hash)
+    }
+    missing, current_hashes = [], set()
+    for model in session.query(ModelEntry).order_by(ModelEntry.id).yield_per(500):
+        content_hash = insights_service.content_hash(model.to_dict())
+        if content_hash not in stored_hashes and content_hash not in current_hashes:
+            missing.append(model.id)
+        current_hashes.add(content_hash)
+    session.close()
+    return missing, current_hashes
+
+
+def prune_stored_insights(current_hashes: Set[str]) -> int:
+    # Drops insights whose content no longer matches any model.
+    try:
+        deleted = (
+            session.query(ModelInsight)
+            .filter(ModelInsight.content_hash.notin_(current_hashes))
+            .delete(synchronize_session=False)
+        )
+        session.commit()
+        return deleted
+    except Exception:
+        session.rollback()
+        raise
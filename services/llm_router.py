@@ -0,0 +1,403 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from google import genai
+from langchain_groq import ChatGroq
+from utils.logging import logger
+from utils.metrics import registry, track_call
+
+load_dotenv()
+
+# Each tier is an ordered list of provider:model candidates of similar cost.
+# Within a tier the router prefers the lowest observed latency, tries
+# candidates with a high error rate or latency last, and falls back down the
+# list.
+DEFAULT_TIERS = {
+    "small": "gemini:gemini-2.0-flash-lite,groq:llama-3.1-8b-instant",
+    "standard": "gemini:gemini-2.0-flash,groq:meta-llama/llama-4-scout-17b-16e-instruct",
+    "large": "gemini:gemini-2.0-flash,gemini:gemini-2.5-flash",
+}
+LLM_TIERS = {
+    tier: os.getenv(f"LLM_TIER_{tier.upper()}", candidates)
+    for tier, candidates in DEFAULT_TIERS.items()
+}
+# The tier each task starts from, before prompt size is considered.
+TASK_TIERS = {
+    "insights": "standard",
+    "custom_question": "small",
+    "comparison": "standard",
+    "autofill": "standard",
+}
+# Small-tier tasks above this many prompt tokens move to the standard tier;
+# any prompt above LLM_LARGE_PROMPT_TOKENS uses the large (long context) tier.
+LLM_SMALL_PROMPT_TOKENS = int(os.getenv("LLM_SMALL_PROMPT_TOKENS", 2000))
+LLM_LARGE_PROMPT_TOKENS = int(os.getenv("LLM_LARGE_PROMPT_TOKENS", 30000))
+# A candidate whose error rate or latency (exponentially weighted,
+# LLM_EWMA_ALPHA per call) is above these is ordered after the healthy ones,
+# so it is only called when they all fail or hedge, until
+# LLM_COOLDOWN_SECONDS after its last attempt.
+LLM_MAX_ERROR_RATE = float(os.getenv("LLM_MAX_ERROR_RATE", 0.5))
+LLM_SLOW_SECONDS = float(os.getenv("LLM_SLOW_SECONDS", 20))
+LLM_COOLDOWN_SECONDS = float(os.getenv("LLM_COOLDOWN_SECONDS", 30))
+LLM_EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", 0.2))
+# The next candidate is started when the current one has run this many times
+# its usual latency, and at least LLM_HEDGE_MIN_SECONDS; 0 only falls back
+# on errors. The clock starts when the call leaves the executor queue.
+LLM_HEDGE_LATENCY_FACTOR = float(os.getenv("LLM_HEDGE_LATENCY_FACTOR", 3))
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", 5))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+# How often a call still queued for a worker is checked for having started.
+QUEUE_POLL_SECONDS = 0.05
+CHARS_PER_TOKEN = 4
+
+llm_requests_total = registry.counter(
+    "llm_requests_total",
+    "LLM calls by task, tier, model and outcome",
+    ("task", "tier", "model", "outcome"),
+)
+llm_request_duration_seconds = registry.histogram(
+    "llm_request_duration_seconds",
+    "LLM call latency in seconds, by task and model",
+    ("task", "model"),
+)
+llm_tokens_total = registry.counter(
+    "llm_tokens_total",
+    "LLM tokens by task, model and direction (input or output)",
+    ("task", "model", "direction"),
+)
+llm_fallbacks_total = registry.counter(
+    "llm_fallbacks_total",
+    "LLM calls handed to the next candidate, by task and reason",
+    ("task", "reason"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def parse_candidates(spec: str) -> List[Tuple[str, str]]:
+    candidates = []
+    for entry in spec.split(","):
+        provider, _, model = entry.strip().partition(":")
+        if provider and model:
+            candidates.append((provider, model))
+    return candidates
+
+
+@dataclass
+class Completion:
+    text: str
+    provider: str
+    model: str
+    input_tokens: int
+    output_tokens: int
+    seconds: float
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, client=None):
+        self.client = client or genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
+    def generate(self, model: str, prompt: str) -> Tuple[str, Optional[Dict]]:
+        with track_call("gemini", "generate_content"):
+            response = self.client.models.generate_content(model=model, contents=prompt)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return response.text, None
+        return response.text, {
+            "input_tokens": usage.prompt_token_count,
+            "output_tokens": usage.candidates_token_count,
+        }
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, temperature: float = 0.1):
+        self.temperature = temperature
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def chat_model(self, model: str):
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = ChatGroq(
+                    temperature=self.temperature,
+                    model_name=model,
+                    groq_api_key=os.getenv("GROQ_API_KEY"),
+                )
+            return self._models[model]
+
+    def generate(self, model: str, prompt: str) -> Tuple[str, Optional[Dict]]:
+        with track_call("groq", "invoke"):
+            message = self.chat_model(model).invoke(prompt)
+        return message.content, getattr(message, "usage_metadata", None)
+
+
+class _ModelHealth:
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.last_attempt = 0.0
+
+    def record(self, seconds: float, failed: bool):
+        if not failed:
+            self.latency = (
+                seconds
+                if self.latency is None
+                else self.latency + LLM_EWMA_ALPHA * (seconds - self.latency)
+            )
+        self.error_rate += LLM_EWMA_ALPHA * (float(failed) - self.error_rate)
+
+    def healthy(self, now: float) -> bool:
+        if now - self.last_attempt >= LLM_COOLDOWN_SECONDS:
+            return True
+        return self.error_rate <= LLM_MAX_ERROR_RATE and (
+            self.latency is None or self.latency <= LLM_SLOW_SECONDS
+        )
+
+
+class LLMRouter:
+    def __init__(self, providers: Dict[str, Any], tiers: Dict[str, str] = LLM_TIERS):
+        self.providers = providers
+        self.tiers = {tier: parse_candidates(spec) for tier, spec in tiers.items()}
+        self._health: Dict[Tuple[str, str], _ModelHealth] = {}
+        self._usage: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm"
+        )
+
+    def tier_for(self, task: str, prompt: str) -> str:
+        tokens = estimate_tokens(prompt)
+        if tokens > LLM_LARGE_PROMPT_TOKENS:
+            return "large"
+        tier = TASK_TIERS.get(task, "standard")
+        if tier == "small" and tokens > LLM_SMALL_PROMPT_TOKENS:
+            return "standard"
+        return tier
+
+    def signature(self, task: str) -> str:
+        # Identifies the candidates a task can use, for cache keys.
+        tier = TASK_TIERS.get(task, "standard")
+        candidates = ",".join(f"{p}:{m}" for p, m in self.tiers[tier])
+        return f"{tier}={candidates}"
+
+    def _health_of(self, candidate: Tuple[str, str]) -> _ModelHealth:
+        with self._lock:
+            return self._health.setdefault(candidate, _ModelHealth())
+
+    def candidates(self, tier: str) -> List[Tuple[str, str]]:
+        # Healthy candidates first, fastest observed first, then tier order.
+        now = time.monotonic()
+        configured = [c for c in self.tiers[tier] if c[0] in self.providers]
+
+        def rank(item):
+            position, candidate = item
+            health = self._health_of(candidate)
+            latency = health.latency if health.latency is not None else float("inf")
+            return (not health.healthy(now), latency, position)
+
+        return [candidate for _, candidate in sorted(enumerate(configured), key=rank)]
+
+    def _hedge_after(self, candidate: Tuple[str, str]) -> Optional[float]:
+        if not LLM_HEDGE_LATENCY_FACTOR:
+            return None
+        latency = self._health_of(candidate).latency
+        if latency is None:
+            return max(LLM_HEDGE_MIN_SECONDS, LLM_SLOW_SECONDS)
+        return max(LLM_HEDGE_MIN_SECONDS, LLM_HEDGE_LATENCY_FACTOR * latency)
+
+    def _call(
+        self,
+        task: str,
+        tier: str,
+        candidate: Tuple[str, str],
+        prompt: str,
+        started: Optional[List[float]] = None,
+    ):
+        provider, model = candidate
+        health = self._health_of(candidate)
+        with self._lock:
+            health.last_attempt = time.monotonic()
+        if started is not None:
+            started.append(health.last_attempt)
+        start = time.perf_counter()
+        try:
+            text, usage = self.providers[provider].generate(model, prompt)
+        except Exception:
+            self._record(task, tier, candidate, time.perf_counter() - start, None, "")
+            raise
+        seconds = time.perf_counter() - start
+        if not usage:
+            usage = {
+                "input_tokens": estimate_tokens(prompt),
+                "output_tokens": estimate_tokens(text or ""),
+            }
+        completion = Completion(
+            text=text,
+            provider=provider,
+            model=model,
+            input_tokens=int(usage["input_tokens"] or 0),
+            output_tokens=int(usage["output_tokens"] or 0),
+            seconds=seconds,
+        )
+        self._record(task, tier, candidate, seconds, completion, prompt)
+        return completion
+
+    def _record(
+        self,
+        task: str,
+        tier: str,
+        candidate: Tuple[str, str],
+        seconds: float,
+        completion: Optional[Completion],
+        prompt: str,
+    ):
+        name = f"{candidate[0]}:{candidate[1]}"
+        failed = completion is None
+        with self._lock:
+            self._health[candidate].record(seconds, failed)
+            usage = self._usage.setdefault(
+                (task, tier, name),
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "seconds": 0.0,
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                },
+            )
+            usage["calls"] += 1
+            usage["errors"] += failed
+            usage["seconds"] += seconds
+            if completion is not None:
+                usage["input_tokens"] += completion.input_tokens
+                usage["output_tokens"] += completion.output_tokens
+        outcome = "error" if failed else "success"
+        llm_requests_total.inc(task=task, tier=tier, model=name, outcome=outcome)
+        llm_request_duration_seconds.observe(seconds, task=task, model=name)
+        if completion is not None:
+            llm_tokens_total.inc(
+                completion.input_tokens, task=task, model=name, direction="input"
+            )
+            llm_tokens_total.inc(
+                completion.output_tokens, task=task, model=name, direction="output"
+            )
+
+    def complete(self, task: str, prompt: str) -> Completion:
+        # Runs the best candidate; a failure starts the next one at once, and
+        # one running past its hedge delay starts the next one alongside it.
+        # Time spent waiting for a free executor worker does not count, so a
+        # saturated pool does not add hedged calls to its own queue.
+        # The first success wins; slower calls finish in the background and
+        # still update the latency estimates.
+        tier = self.tier_for(task, prompt)
+        remaining = self.candidates(tier)
+        if not remaining:
+            raise RuntimeError(f"No LLM providers configured for tier {tier}")
+        running: Dict[Future, Tuple[str, str]] = {}
+        last_error: Optional[Exception] = None
+
+        def start_next():
+            candidate = remaining.pop(0)
+            # _call appends the time it started running.
+            started: List[float] = []
+            context = contextvars.copy_context()
+            future = self.executor.submit(
+                context.run, self._call, task, tier, candidate, prompt, started
+            )
+            running[future] = candidate
+            return candidate, started
+
+        current, started = start_next()
+        while running:
+            hedge_after = self._hedge_after(current) if remaining else None
+            timeout = None
+            if hedge_after is not None:
+                timeout = (
+                    max(0.0, started[0] + hedge_after - time.monotonic())
+                    if started
+                    else QUEUE_POLL_SECONDS
+                )
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if not started or time.monotonic() < started[0] + hedge_after:
+                    continue
+                llm_fallbacks_total.inc(task=task, reason="slow")
+                logger.warning(
+                    f"{current[0]}:{current[1]} slow for {task}, also trying the next model"
+                )
+                current, started = start_next()
+                continue
+            for future in done:
+                candidate = running.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(
+                        f"{candidate[0]}:{candidate[1]} failed for {task}: {str(e)}"
+                    )
+            if remaining and not running:
+                llm_fallbacks_total.inc(task=task, reason="error")
+                current, started = start_next()
+        raise last_error
+
+    def generate(self, task: str, prompt: str) -> str:
+        return self.complete(task, prompt).text
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            health = {
+                f"{provider}:{model}": {
+                    "latency_seconds": (
+                        round(state.latency, 3) if state.latency is not None else None
+                    ),
+                    "error_rate": round(state.error_rate, 3),
+                }
+                for (provider, model), state in self._health.items()
+            }
+            routes = [
+                {
+                    "task": task,
+                    "tier": tier,
+                    "model": name,
+                    "calls": usage["calls"],
+                    "errors": usage["errors"],
+                    "mean_seconds": round(usage["seconds"] / usage["calls"], 3),
+                    "input_tokens": usage["input_tokens"],
+                    "output_tokens": usage["output_tokens"],
+                }
+                for (task, tier, name), usage in sorted(self._usage.items())
+            ]
+        return {
+            "tiers": {
+                tier: [f"{p}:{m}" for p, m in candidates]
+                for tier, candidates in self.tiers.items()
+            },
+            "task_tiers": TASK_TIERS,
+            "models": health,
+            "routes": routes,
+        }
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    # One router per process, so every service shares the health estimates.
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter({"gemini": GeminiProvider(), "groq": GroqProvider()})
+        return _router
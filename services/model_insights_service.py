@@ -1,16 +1,37 @@
 import os
+import contextvars
+import hashlib
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, Any, List
-from google import genai
 from dotenv import load_dotenv
+from services.llm_router import get_router
 from utils.logging import logger
+from utils.cache import get_cache
 
 load_dotenv()
 
+INSIGHTS_CACHE_TTL = float(os.getenv("INSIGHTS_CACHE_TTL", 24 * 60 * 60))
+
+# Placeholder returned for a section whose generation failed.
+GENERATION_ERROR = "Error generating insights"
+
 
 class ModelInsightsService:
+    PROMPT_VERSION = 1
+    # Model fields read by _prepare_context; other edits leave insights valid.
+    CONTEXT_FIELDS = ("name", "developer", "model_type", "parameters", "tags", "notes")
+
     def __init__(self):
-        self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-        self.model = "gemini-2.0-flash"
+        # Picks the model per prompt from the tier configured for its task.
+        self.router = get_router()
+        # Shared by all requests in the worker; bounds concurrent LLM calls.
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("INSIGHTS_MAX_CONCURRENCY", 16)),
+            thread_name_prefix="insights",
+        )
+        # Generated text keyed by model and prompt, shared across workers.
+        self.cache = get_cache("insights", INSIGHTS_CACHE_TTL)
         logger.info("ModelInsightsService initialized")
 
     def generate_model_insights(
@@ -22,7 +43,7 @@ class ModelInsightsService:
         insights = {}
 
         if custom_prompt:
-            logger.debug(f"Using custom prompt: {custom_prompt}")
+            logger.debug("Using custom prompt: %s", custom_prompt)
             context = self._prepare_context(model_data)
             custom_prompt_with_context = f"""
             Given this ML model context:
@@ -34,7 +55,7 @@ class ModelInsightsService:
             Provide a detailed, specific, and actionable response focusing on the user's query.
             """
             insights["custom_analysis"] = self._generate_content(
-                custom_prompt_with_context
+                custom_prompt_with_context, "custom_question"
             )
             return insights
 
@@ -58,7 +79,8 @@ class ModelInsightsService:
         
         Format as clear bullet points with specific, actionable insights.
         """
-        insights["technical_analysis"] = self._generate_content(tech_prompt)
+        # The sections are independent, so their LLM calls run concurrently.
+        pending = {"technical_analysis": self._submit_content(tech_prompt)}
 
         use_case_prompt = f"""
         Based on this ML model context:
@@ -80,7 +102,7 @@ class ModelInsightsService:
         
         Format as clear bullet points with practical, implementable suggestions.
         """
-        insights["use_cases"] = self._generate_content(use_case_prompt)
+        pending["use_cases"] = self._submit_content(use_case_prompt)
 
         rec_prompt = f"""
         Based on this ML model context:
@@ -102,7 +124,10 @@ class ModelInsightsService:
         
         Format as clear bullet points with specific, actionable steps.
         """
-        insights["recommendations"] = self._generate_content(rec_prompt)
+        pending["recommendations"] = self._submit_content(rec_prompt)
+
+        for section, future in pending.items():
+            insights[section] = future.result()
 
         logger.info("Successfully generated all insights")
         return insights
@@ -120,25 +145,64 @@ class ModelInsightsService:
 
         return "\n".join(context_parts)
 
-    def _generate_content(self, prompt: str) -> str:
+    def content_hash(self, model_data: Dict[str, Any]) -> str:
+        fingerprint = (
+            f"{self.PROMPT_VERSION}:{self.router.signature('insights')}:"
+            f"{self._prepare_context(model_data)}"
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def comparison_hash(
+        self, models_data: List[Dict[str, Any]], custom_prompt: str = None
+    ) -> str:
+        fingerprint = json.dumps(
+            [
+                self.PROMPT_VERSION,
+                self.router.signature("comparison"),
+                models_data,
+                custom_prompt,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def _submit_content(self, prompt: str, task: str = "insights") -> Future:
+        # Run in a copy of the caller's context so request ids reach the logs.
+        context = contextvars.copy_context()
+        return self.executor.submit(context.run, self._generate_content, prompt, task)
+
+    def _prompt_key(self, prompt: str, task: str) -> str:
+        return hashlib.sha256(
+            f"{self.router.signature(task)}:{prompt}".encode("utf-8")
+        ).hexdigest()
+
+    def _generate_content(self, prompt: str, task: str = "insights") -> str:
+        cache_key = self._prompt_key(prompt, task)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.models.generate_content(
-                model=self.model, contents=prompt
-            )
-            return response.text
+            text = self.router.generate(task, prompt)
+            self.cache.set(cache_key, text)
+            return text
         except Exception as e:
             logger.error(f"Error generating content: {str(e)}")
-            return "Error generating insights"
+            return GENERATION_ERROR
 
     def analyze_multiple_models(
         self, models_data: List[Dict[str, Any]], custom_prompt: str = None
     ) -> Dict[str, Any]:
         logger.info(f"Starting comparative analysis of {len(models_data)} models")
+        cache_key = f"compare:{self.comparison_hash(models_data, custom_prompt)}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         contexts = [str(model) for model in models_data]
         combined_context = "\n\n".join(contexts)
 
         if custom_prompt:
-            logger.debug(f"Using custom prompt for comparison: {custom_prompt}")
+            logger.debug("Using custom prompt for comparison: %s", custom_prompt)
             prompt = f"""
             Based on these ML models:
             {combined_context}
@@ -164,11 +228,11 @@ class ModelInsightsService:
             """
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model, contents=prompt
-            )
+            text = self.router.generate("comparison", prompt)
             logger.info("Comparative analysis completed successfully")
-            return {"comparative_analysis": response.text}
+            analysis = {"comparative_analysis": text}
+            self.cache.set(cache_key, analysis)
+            return analysis
         except Exception as e:
             logger.error(f"Error in comparative analysis: {str(e)}")
             return {"error": "Failed to generate comparative analysis"}
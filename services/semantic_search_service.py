@@ -1,73 +1,121 @@
+import hashlib
 import os
 from google import genai
-import numpy as np
 from typing import List, Dict
-from models.models import ModelEntry, session
-from sklearn.metrics.pairwise import cosine_similarity
+from sqlalchemy.orm import joinedload
+from models.models import ModelEmbedding, ModelEntry, session
 from dotenv import load_dotenv
 from utils.logging import logger
+from utils.metrics import track_call
+from utils.cache import VectorSerializer, get_cache
+from services.vector_store import EmbeddingStore
 
 load_dotenv()
 
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", 7 * 24 * 60 * 60))
+
 
 class SemanticSearchService:
+    # Upper bound on texts per embed_content request.
+    EMBED_BATCH_SIZE = 100
+
     def __init__(self):
         self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
         self.embeddings = "models/text-embedding-004"
+        # Keyed by text, so unchanged models are never re-embedded.
+        self.cache = get_cache("embeddings", EMBEDDING_CACHE_TTL, VectorSerializer)
+        # Model embeddings persisted and indexed for search and similarity.
+        self.store = EmbeddingStore(self)
         logger.info("SemanticSearchService initialized successfully")
 
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.embeddings}:{text}".encode("utf-8")).hexdigest()
+
     def _get_embedding(self, text: str) -> List[float]:
         if not text or not isinstance(text, str):
             logger.warning(f"Invalid text input for embedding: {text}")
             return []
+        cache_key = self._cache_key(text)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.models.embed_content(
-                model=self.embeddings,
-                contents=text,
-            )
+            with track_call("gemini", "embed_content"):
+                response = self.client.models.embed_content(
+                    model=self.embeddings,
+                    contents=text,
+                )
             logger.debug("Embedding generated successfully")
+            self.cache.set(cache_key, response.embeddings[0].values)
             return response.embeddings[0].values
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
             return []
 
-    def _get_model_embedding(self, model: ModelEntry) -> List[float]:
-        model_text = f"{model.name} {model.notes or ''} {model.model_type or ''} {model.developer or ''} {model.license or ''} {model.version or ''} {' '.join(model.tags or [])} {' '.join(model.source_links or [])}"
-        return self._get_embedding(model_text)
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cache_keys = [self._cache_key(text) for text in texts]
+        embeddings = self.cache.get_many(cache_keys)
+        missing = [
+            index for index, embedding in enumerate(embeddings) if embedding is None
+        ]
+        for start in range(0, len(missing), self.EMBED_BATCH_SIZE):
+            batch = missing[start : start + self.EMBED_BATCH_SIZE]
+            try:
+                with track_call("gemini", "embed_content_batch"):
+                    response = self.client.models.embed_content(
+                        model=self.embeddings,
+                        contents=[texts[index] for index in batch],
+                    )
+                computed = {}
+                for index, embedding in zip(batch, response.embeddings):
+                    embeddings[index] = embedding.values
+                    computed[cache_keys[index]] = embedding.values
+                self.cache.set_many(computed)
+            except Exception as e:
+                logger.error(f"Failed to generate embedding batch: {str(e)}")
+                for index in batch:
+                    embeddings[index] = []
+        return embeddings
+
+    def model_text(self, model: ModelEntry) -> str:
+        return f"{model.name} {model.notes or ''} {model.model_type or ''} {model.developer or ''} {model.license or ''} {model.version or ''} {' '.join(model.tags or [])} {' '.join(model.source_links or [])}"
 
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         query_embedding = self._get_embedding(query)
-        logger.debug(f"Query embedding generated with length: {len(query_embedding)}")
-
-        models = session.query(ModelEntry).all()
-        if not models:
-            logger.warning("No models found in database")
+        if not query_embedding:
+            logger.warning("No query embedding was generated")
             return []
+        logger.debug("Query embedding generated with length: %d", len(query_embedding))
 
-        model_embeddings = []
-        successful_models = []
-        for model in models:
-            logger.debug(f"Processing model: {model.name}")
-            model_embedding = self._get_model_embedding(model)
-            if model_embedding:
-                model_embeddings.append(model_embedding)
-                successful_models.append(model)
-            else:
-                logger.warning(f"Failed to generate embedding for model: {model.name}")
+        # Writes are embedded in the background by the similarity scheduler;
+        # only models that have no stored embedding yet are embedded here.
+        unembedded = (
+            session.query(ModelEntry)
+            .outerjoin(ModelEmbedding, ModelEmbedding.model_id == ModelEntry.id)
+            .filter(ModelEmbedding.model_id.is_(None))
+            .all()
+        )
+        if unembedded and self.store.embed_models(unembedded):
+            session.commit()
 
-        if not model_embeddings:
-            logger.warning("No valid model embeddings were generated")
+        hits = self.store.index().search(query_embedding, top_k)
+        if not hits:
+            logger.warning("No model embeddings found in database")
             return []
-
-        similarities = cosine_similarity([query_embedding], model_embeddings)[0]
-
-        model_scores = list(zip(successful_models, similarities))
-        model_scores.sort(key=lambda x: x[1], reverse=True)
+        models_by_id = {
+            model.id: model
+            for model in session.query(ModelEntry)
+            .options(joinedload(ModelEntry.user))
+            .filter(ModelEntry.id.in_([model_id for model_id, _ in hits]))
+        }
 
         results = []
-        for model, score in model_scores[:top_k]:
+        for model_id, score in hits:
+            model = models_by_id.get(model_id)
+            if model is None:
+                continue
             model_dict = model.to_dict()
-            model_dict["relevance_score"] = float(score)
+            model_dict["relevance_score"] = score
             results.append(model_dict)
 
         logger.info(f"Search completed. Returning {len(results)} results")
@@ -0,0 +1,245 @@
+import os
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select
+from models.models import ModelEmbedding, ModelEntry, ModelNeighbor, session
+from services.semantic_search_service import SemanticSearchService
+from utils.debounce import DebouncedRunner
+from utils.logging import logger
+
+load_dotenv()
+
+SIMILARITY_REFRESH_ENABLED = (
+    os.getenv("SIMILARITY_REFRESH_ENABLED", "true").lower() == "true"
+)
+SIMILARITY_REFRESH_DELAY = float(os.getenv("SIMILARITY_REFRESH_DELAY", 5))
+SIMILARITY_REFRESH_CONCURRENCY = int(os.getenv("SIMILARITY_REFRESH_CONCURRENCY", 1))
+SIMILAR_GRAPH_K = int(os.getenv("SIMILAR_GRAPH_K", 10))
+SIMILAR_DUPLICATE_THRESHOLD = float(os.getenv("SIMILAR_DUPLICATE_THRESHOLD", 0.95))
+# The ModelEntry fields that SemanticSearchService.model_text embeds.
+SIMILARITY_TEXT_FIELDS = (
+    "name",
+    "notes",
+    "model_type",
+    "developer",
+    "license",
+    "version",
+    "tags",
+    "source_links",
+)
+# Rows of the similarity matrix computed at once when building a graph.
+GRAPH_BLOCK_SIZE = 1024
+# First key of the per-user advisory lock that serialises graph writes.
+GRAPH_LOCK_KEY = 0x53494D
+
+
+class SimilarityService:
+    def __init__(
+        self,
+        search_service: SemanticSearchService,
+        k: int = SIMILAR_GRAPH_K,
+        delay: float = SIMILARITY_REFRESH_DELAY,
+        concurrency: int = SIMILARITY_REFRESH_CONCURRENCY,
+    ):
+        # Embeddings are the ones semantic search stores.
+        self.store = search_service.store
+        self.k = k
+        self._runner = DebouncedRunner(
+            self.refresh_model, delay, concurrency, "similarity"
+        )
+        # Whole-catalog builds, keyed by user, start as soon as a worker is free.
+        self._builds = DebouncedRunner(
+            self._build_user_graph_job, 0, concurrency, "similarity-build"
+        )
+
+    def schedule(self, model_id: int):
+        if SIMILARITY_REFRESH_ENABLED:
+            self._runner.schedule(model_id)
+
+    def cancel(self, model_id: int):
+        self._runner.cancel(model_id)
+
+    def schedule_build(self, user_id: int):
+        if SIMILARITY_REFRESH_ENABLED:
+            self._builds.schedule(user_id)
+
+    def _top_k(
+        self, ids: np.ndarray, matrix: np.ndarray, positions: np.ndarray
+    ) -> Dict[int, List[Tuple[int, float]]]:
+        k = min(self.k, len(ids) - 1)
+        neighbors = {}
+        for start in range(0, len(positions), GRAPH_BLOCK_SIZE):
+            block = positions[start : start + GRAPH_BLOCK_SIZE]
+            scores = matrix[block] @ matrix.T
+            scores[np.arange(len(block)), block] = -np.inf
+            if k > 0:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, position in enumerate(block):
+                if k <= 0:
+                    neighbors[int(ids[position])] = []
+                    continue
+                order = top[row][np.argsort(-scores[row, top[row]])]
+                neighbors[int(ids[position])] = [
+                    (int(ids[index]), float(scores[row, index])) for index in order
+                ]
+        return neighbors
+
+    def _store_neighbors(self, neighbors: Dict[int, List[Tuple[int, float]]]):
+        session.execute(
+            delete(ModelNeighbor).where(ModelNeighbor.model_id.in_(list(neighbors)))
+        )
+        rows = [
+            {"model_id": model_id, "neighbor_id": neighbor_id, "similarity": score}
+            for model_id, entries in neighbors.items()
+            for neighbor_id, score in entries
+        ]
+        if rows:
+            session.execute(insert(ModelNeighbor), rows)
+
+    def _lock_graph(self, user_id: int):
+        # Held until the transaction ends, so builds and refreshes of one
+        # user's graph run one at a time across threads and workers. Work
+        # under it embeds without releasing the connection, which would end
+        # the transaction.
+        session.execute(select(func.pg_advisory_xact_lock(GRAPH_LOCK_KEY, user_id)))
+
+    def _missing_embeddings(self, user_id: int) -> int:
+        return session.execute(
+            select(func.count(ModelEntry.id))
+            .outerjoin(ModelEmbedding, ModelEmbedding.model_id == ModelEntry.id)
+            .where(ModelEntry.user_id == user_id, ModelEmbedding.model_id.is_(None))
+        ).scalar_one()
+
+    def needs_build(self, user_id: int) -> bool:
+        # More than one model without an embedding means the catalog was
+        # never built (or predates the graph); one is a model just added.
+        return self._missing_embeddings(user_id) > 1
+
+    def build_user_graph(self, user_id: int) -> int:
+        self._lock_graph(user_id)
+        models = session.query(ModelEntry).filter_by(user_id=user_id).all()
+        self.store.embed_models(models, release_connection=False)
+        ids, matrix = self.store.load_matrix(user_id)
+        self._store_neighbors(self._top_k(ids, matrix, np.arange(len(ids))))
+        session.commit()
+        logger.info(f"Built similarity graph of {len(ids)} models for user {user_id}")
+        return len(ids)
+
+    def _build_user_graph_job(self, user_id: int):
+        # Runs on the build pool, which gets its own scoped session. Requests
+        # that queued it again while it ran find nothing left to build.
+        try:
+            self._lock_graph(user_id)
+            if self.needs_build(user_id):
+                self.build_user_graph(user_id)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to build similarity graph for user {user_id}: {e}")
+        finally:
+            session.remove()
+
+    def refresh_neighbors(self, model: ModelEntry):
+        model_id, user_id = model.id, model.user_id
+        self._lock_graph(user_id)
+        if not self.store.embed_models([model], release_connection=False) and (
+            session.query(ModelNeighbor).filter_by(model_id=model_id).count() >= self.k
+        ):
+            # Same vector and a full list: nothing can have changed. A short
+            # list means one of its neighbours was deleted.
+            session.commit()
+            return
+        ids, matrix = self.store.load_matrix(user_id)
+        positions = {int(other_id): index for index, other_id in enumerate(ids)}
+        if model_id not in positions:
+            session.commit()
+            return
+        scores = matrix @ matrix[positions[model_id]]
+
+        # Only lists that held this model, or that it now enters, can change.
+        listing = set(
+            session.scalars(
+                select(ModelNeighbor.model_id).where(
+                    ModelNeighbor.neighbor_id == model_id
+                )
+            )
+        )
+        thresholds = dict(
+            session.execute(
+                select(ModelNeighbor.model_id, func.min(ModelNeighbor.similarity))
+                .join(ModelEntry, ModelEntry.id == ModelNeighbor.model_id)
+                .where(ModelEntry.user_id == user_id)
+                .group_by(ModelNeighbor.model_id)
+                .having(func.count() >= self.k)
+            ).all()
+        )
+        affected = {model_id} | listing
+        for other_id, position in positions.items():
+            if scores[position] > thresholds.get(other_id, -np.inf):
+                affected.add(other_id)
+        affected_positions = np.array(
+            [positions[other_id] for other_id in affected if other_id in positions]
+        )
+        self._store_neighbors(self._top_k(ids, matrix, affected_positions))
+        session.commit()
+        logger.debug(
+            "Refreshed similarity of model %s and %d affected neighbour lists",
+            model_id,
+            len(affected) - 1,
+        )
+
+    def ensure_graph(self, model: ModelEntry):
+        # Builds the whole graph the first time, then maintains it per model.
+        # Checked under the lock, so a build another worker just finished is
+        # not repeated.
+        self._lock_graph(model.user_id)
+        if self.needs_build(model.user_id):
+            self.build_user_graph(model.user_id)
+        else:
+            self.refresh_neighbors(model)
+
+    def refresh_model(self, model_id: int) -> bool:
+        # Runs on the debounce pool, which gets its own scoped session.
+        try:
+            model = session.get(ModelEntry, model_id)
+            if model is None:
+                return False
+            self.ensure_graph(model)
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to refresh similarity for model {model_id}: {e}")
+            return False
+        finally:
+            session.remove()
+
+    def listing_models(self, model_ids) -> List[int]:
+        # Models whose neighbour lists include any of model_ids, which may
+        # be a list or a select of ids.
+        return list(
+            session.scalars(
+                select(ModelNeighbor.model_id)
+                .where(ModelNeighbor.neighbor_id.in_(model_ids))
+                .distinct()
+            )
+        )
+
+    def has_embedding(self, model_id: int) -> bool:
+        return session.get(ModelEmbedding, model_id) is not None
+
+    def similar(self, model_id: int, k: int) -> List[Dict[str, Any]]:
+        rows = (
+            session.query(ModelEntry, ModelNeighbor.similarity)
+            .join(ModelNeighbor, ModelNeighbor.neighbor_id == ModelEntry.id)
+            .filter(ModelNeighbor.model_id == model_id)
+            .order_by(ModelNeighbor.similarity.desc())
+            .limit(k)
+            .all()
+        )
+        results = []
+        for neighbor, similarity in rows:
+            entry = neighbor.to_dict()
+            entry["similarity"] = similarity
+            entry["likely_duplicate"] = similarity >= SIMILAR_DUPLICATE_THRESHOLD
+            results.append(entry)
+        return results
@@ -0,0 +1,289 @@
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.models import ModelEmbedding, ModelEntry, model_embedding_seq, session
+from utils.logging import logger
+from utils.vectors import REPRESENTATIONS, VectorIndex, normalized, quantize_int8
+
+load_dotenv()
+
+VECTOR_REPRESENTATION = os.getenv("VECTOR_REPRESENTATION", "float32")
+# Directory of memory-mapped vector files shared by all workers on a host;
+# empty keeps each worker's vectors in its own memory.
+VECTOR_MMAP_DIR = os.getenv("VECTOR_MMAP_DIR", "")
+VECTOR_INDEX_MAX_ENTRIES = int(os.getenv("VECTOR_INDEX_MAX_ENTRIES", 32))
+# Embeddings written per INSERT statement.
+UPSERT_BATCH_SIZE = 500
+# Superseded vector files are removed only once this old (seconds), so a
+# worker that just found them can still map them.
+MMAP_STALE_GRACE = 60
+MMAP_LOAD_ATTEMPTS = 3
+_MAPPED_GENERATION = re.compile(r"-(\d+)-[0-9a-f]+\.\w+\.npy$")
+
+if VECTOR_REPRESENTATION not in REPRESENTATIONS:
+    raise ValueError(
+        f"VECTOR_REPRESENTATION must be one of: {', '.join(REPRESENTATIONS)}"
+    )
+
+
+class EmbeddingStore:
+    # Model embeddings persisted in model_embeddings, plus per-scope (one
+    # user, or every model when user_id is None) search indexes rebuilt only
+    # when the stored embeddings of that scope change.
+    def __init__(
+        self,
+        search_service,
+        representation: str = VECTOR_REPRESENTATION,
+        mmap_dir: str = VECTOR_MMAP_DIR,
+        max_entries: int = VECTOR_INDEX_MAX_ENTRIES,
+    ):
+        # search_service is the SemanticSearchService that embeds the text.
+        self.search_service = search_service
+        self.representation = representation
+        self.mmap_dir = mmap_dir
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[Optional[int], Tuple[str, VectorIndex]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        if mmap_dir:
+            os.makedirs(mmap_dir, exist_ok=True)
+
+    def text_hash(self, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.search_service.embeddings}:{text}".encode("utf-8")
+        ).hexdigest()
+
+    def embed_models(
+        self, models: List[ModelEntry], release_connection: bool = True
+    ) -> int:
+        # Embeds only models whose text changed since their stored embedding.
+        # The caller commits.
+        texts = {model.id: self.search_service.model_text(model) for model in models}
+        user_ids = {model.id: model.user_id for model in models}
+        stored = dict(
+            session.execute(
+                select(ModelEmbedding.model_id, ModelEmbedding.text_hash).where(
+                    ModelEmbedding.model_id.in_(list(texts))
+                )
+            ).all()
+        )
+        stale = [
+            model_id
+            for model_id, text in texts.items()
+            if stored.get(model_id) != self.text_hash(text)
+        ]
+        if not stale:
+            return 0
+        # Release the connection while the embedding provider is called,
+        # unless the caller holds a lock in its transaction.
+        if release_connection:
+            session.close()
+
+        vectors = self.search_service.get_embeddings(
+            [texts[model_id] for model_id in stale]
+        )
+        rows = [
+            {
+                "model_id": model_id,
+                "user_id": user_ids[model_id],
+                "text_hash": self.text_hash(texts[model_id]),
+                "vector": normalized(vector).tobytes(),
+                "updated_at": datetime.utcnow(),
+            }
+            for model_id, vector in zip(stale, vectors)
+            if vector
+        ]
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            statement = pg_insert(ModelEmbedding).values(
+                rows[start : start + UPSERT_BATCH_SIZE]
+            )
+            session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["model_id"],
+                    set_={
+                        "text_hash": statement.excluded.text_hash,
+                        "vector": statement.excluded.vector,
+                        "updated_at": statement.excluded.updated_at,
+                        "change_seq": model_embedding_seq.next_value(),
+                    },
+                )
+            )
+        return len(rows)
+
+    def _scoped(self, statement, user_id: Optional[int]):
+        if user_id is None:
+            return statement
+        return statement.where(ModelEmbedding.user_id == user_id)
+
+    def _load(self, user_id: Optional[int]) -> Tuple[np.ndarray, np.ndarray, str]:
+        # The vectors of a scope and the fingerprint of exactly those rows.
+        rows = session.execute(
+            self._scoped(
+                select(
+                    ModelEmbedding.model_id,
+                    ModelEmbedding.vector,
+                    ModelEmbedding.change_seq,
+                ),
+                user_id,
+            ).order_by(ModelEmbedding.model_id)
+        ).all()
+        ids = np.array([row.model_id for row in rows], dtype=np.int64)
+        seqs = [row.change_seq for row in rows]
+        fingerprint = self._fingerprint_of(len(rows), sum(seqs), max(seqs, default=0))
+        if not rows:
+            return ids, np.zeros((0, 0), dtype=np.float32), fingerprint
+        matrix = np.frombuffer(b"".join(row.vector for row in rows), np.float32)
+        return ids, matrix.reshape(len(rows), -1), fingerprint
+
+    def load_matrix(
+        self, user_id: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ids, matrix, _ = self._load(user_id)
+        return ids, matrix
+
+    def fetch(self, model_ids: np.ndarray) -> np.ndarray:
+        # Full-precision vectors in the order of model_ids. Rows deleted since
+        # the index was built come back as NaN (no columns at all when none
+        # was found), which search skips.
+        vectors = dict(
+            session.execute(
+                select(ModelEmbedding.model_id, ModelEmbedding.vector).where(
+                    ModelEmbedding.model_id.in_([int(i) for i in model_ids])
+                )
+            ).all()
+        )
+        if not vectors:
+            return np.empty((len(model_ids), 0), dtype=np.float32)
+        dimensions = len(next(iter(vectors.values()))) // np.dtype(np.float32).itemsize
+        fetched = np.full((len(model_ids), dimensions), np.nan, dtype=np.float32)
+        for row, model_id in enumerate(model_ids):
+            vector = vectors.get(int(model_id))
+            if vector is not None:
+                fetched[row] = np.frombuffer(vector, np.float32)
+        return fetched
+
+    def _fingerprint_of(self, count: int, seq_sum: int, last_seq: int) -> str:
+        # Every write stamps its row with a fresh sequence value, so a write
+        # committed after another with a higher stamp still changes the sum.
+        # The zero-padded last stamp orders fingerprints for file cleanup.
+        digest = hashlib.sha256(
+            f"{self.search_service.embeddings}:{count}:{seq_sum}".encode("utf-8")
+        ).hexdigest()[:16]
+        return f"{last_seq:012d}-{digest}"
+
+    def _fingerprint(self, user_id: Optional[int]) -> str:
+        count, seq_sum, last_seq = session.execute(
+            self._scoped(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(ModelEmbedding.change_seq), 0),
+                    func.coalesce(func.max(ModelEmbedding.change_seq), 0),
+                ),
+                user_id,
+            )
+        ).one()
+        return self._fingerprint_of(count, int(seq_sum), last_seq)
+
+    def _mapped_paths(self, scope: str, fingerprint: str) -> Dict[str, str]:
+        base = os.path.join(self.mmap_dir, f"embeddings-{scope}-{fingerprint}")
+        names = ["ids", "vectors"]
+        if self.representation == "int8":
+            names += ["codes", "scales"]
+        return {name: f"{base}.{name}.npy" for name in names}
+
+    def _write_mapped(self, scope: str, user_id: Optional[int]) -> str:
+        # Named after the rows actually read, which may be newer than the
+        # fingerprint the caller looked up.
+        ids, matrix, fingerprint = self._load(user_id)
+        arrays = {"ids": ids, "vectors": matrix}
+        if self.representation == "int8":
+            arrays["codes"], arrays["scales"] = quantize_int8(matrix)
+        for name, path in self._mapped_paths(scope, fingerprint).items():
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                np.save(f, arrays[name])
+            os.replace(temporary, path)
+        self._remove_stale(scope, fingerprint)
+        return fingerprint
+
+    def _remove_stale(self, scope: str, fingerprint: str):
+        # Only files of an older generation that have sat unused past the
+        # grace period; a worker behind this one never removes newer files.
+        generation = int(fingerprint.split("-")[0])
+        cutoff = time.time() - MMAP_STALE_GRACE
+        for path in glob.glob(os.path.join(self.mmap_dir, f"embeddings-{scope}-*.npy")):
+            match = _MAPPED_GENERATION.search(path)
+            try:
+                if (
+                    match
+                    and int(match.group(1)) < generation
+                    and os.path.getmtime(path) < cutoff
+                ):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _mapped_arrays(
+        self, user_id: Optional[int], fingerprint: str
+    ) -> Tuple[Dict, str]:
+        # One set of .npy files per scope and fingerprint, written once and
+        # mapped read-only by every worker.
+        scope = "all" if user_id is None else f"user{user_id}"
+        for attempt in range(MMAP_LOAD_ATTEMPTS):
+            paths = self._mapped_paths(scope, fingerprint)
+            if attempt or not all(os.path.exists(path) for path in paths.values()):
+                fingerprint = self._write_mapped(scope, user_id)
+                paths = self._mapped_paths(scope, fingerprint)
+            try:
+                return {
+                    name: np.load(path, mmap_mode="r") for name, path in paths.items()
+                }, fingerprint
+            except FileNotFoundError:
+                # Removed by another worker between the check and the load.
+                logger.debug("Vector files for %s vanished, rewriting them", scope)
+        raise FileNotFoundError(f"Could not map vector files for {scope}")
+
+    def index(self, user_id: Optional[int] = None) -> VectorIndex:
+        fingerprint = self._fingerprint(user_id)
+        with self._lock:
+            cached = self._indexes.get(user_id)
+            if cached is not None and cached[0] == fingerprint:
+                self._indexes.move_to_end(user_id)
+                return cached[1]
+
+        if self.mmap_dir:
+            arrays, fingerprint = self._mapped_arrays(user_id, fingerprint)
+        else:
+            ids, matrix, fingerprint = self._load(user_id)
+            arrays = {"ids": ids, "vectors": matrix}
+        index = VectorIndex(
+            arrays["ids"],
+            arrays["vectors"],
+            self.representation,
+            codes=arrays.get("codes"),
+            scales=arrays.get("scales"),
+            fetch=self.fetch,
+        )
+        logger.debug(
+            "Loaded %d %s vectors (%d bytes resident)",
+            len(index),
+            self.representation,
+            index.nbytes,
+        )
+        with self._lock:
+            self._indexes[user_id] = (fingerprint, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
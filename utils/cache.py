@@ -0,0 +1,466 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from utils.logging import logger
+from utils.metrics import record_cache_lookup
+
+load_dotenv()
+
+# lru: per-process; sqlite: one file shared by the workers on a host;
+# redis: shared by every host (any Redis-protocol server).
+CACHE_BACKENDS = ("lru", "sqlite", "redis")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "lru").lower()
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH") or os.path.join(
+    os.path.abspath(os.path.dirname(os.path.dirname(__file__))), "cache.sqlite3"
+)
+CACHE_SQLITE_MMAP_BYTES = int(os.getenv("CACHE_SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "trackml")
+CACHE_DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", 24 * 60 * 60))
+
+
+class CacheBackend:
+    # Stores bytes under string keys. TTLs are in seconds; None never expires.
+    name = "base"
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    # Counters live apart from entries so that eviction never resets them.
+    def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.set_many({key: value}, ttl)
+
+
+class LRUCacheBackend(CacheBackend):
+    name = "lru"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # Key -> (value, monotonic expiry or None), least recently used first.
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] is not None and entry[1] <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                values.append(entry[0] if entry else None)
+        return values
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self) -> Optional[int]:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    # A WAL-mode SQLite file read through mmap: workers on one host share
+    # entries and invalidations without running a cache server.
+    name = "sqlite"
+    PRUNE_EVERY = 500
+
+    def __init__(
+        self,
+        path: str = CACHE_SQLITE_PATH,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        mmap_bytes: int = CACHE_SQLITE_MMAP_BYTES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, "
+            "stored_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS counters "
+            "(key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared between threads.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        now = time.time()
+        found = {}
+        connection = self._connection()
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (*batch, now),
+                ).fetchall()
+            )
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        connection = self._connection()
+        connection.executemany(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, stored_at) "
+            "VALUES (?, ?, ?, ?)",
+            [(key, value, expires_at, now) for key, value in items.items()],
+        )
+        with self._writes_lock:
+            self._writes += len(items)
+            prune = self._writes >= self.PRUNE_EVERY
+            if prune:
+                self._writes = 0
+        if prune:
+            self._prune(connection, now)
+
+    def _prune(self, connection: sqlite3.Connection, now: float):
+        connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        connection.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+            "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def counter(self, key: str) -> int:
+        row = (
+            self._connection()
+            .execute("SELECT value FROM counters WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+    def incr(self, key: str) -> int:
+        (value,) = (
+            self._connection()
+            .execute(
+                "INSERT INTO counters (key, value) VALUES (?, 1) ON CONFLICT(key) "
+                "DO UPDATE SET value = value + 1 RETURNING value",
+                (key,),
+            )
+            .fetchone()
+        )
+        return value
+
+    def size(self) -> Optional[int]:
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class RedisCacheBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, url: str = CACHE_REDIS_URL, client=None):
+        if client is None:
+            # Only needed with CACHE_BACKEND=redis.
+            import redis
+
+            client = redis.Redis.from_url(
+                url, socket_timeout=1, socket_connect_timeout=1
+            )
+        self.client = client
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.client.mget(keys) if keys else []
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        if not items:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(key, value, px=int(ttl * 1000) if ttl else None)
+        pipeline.execute()
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    # Counters have no TTL, so a volatile-* maxmemory policy never evicts them.
+    def counter(self, key: str) -> int:
+        value = self.client.get(key)
+        return int(value) if value else 0
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+    def size(self) -> Optional[int]:
+        return int(self.client.dbsize())
+
+
+class JsonSerializer:
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        return json.loads(data)
+
+
+class VectorSerializer:
+    # Embeddings as raw float32: a quarter of their JSON size.
+    @staticmethod
+    def dumps(value: Iterable[float]) -> bytes:
+        return np.asarray(value, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def loads(data: bytes) -> List[float]:
+        return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+class Cache:
+    # A namespace in a shared backend. Keys embed the namespace's version, so
+    # invalidate() drops every entry at once, in every worker, by bumping it.
+    def __init__(
+        self,
+        backend: CacheBackend,
+        namespace: str,
+        ttl: Optional[float] = CACHE_DEFAULT_TTL,
+        serializer=JsonSerializer,
+    ):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.serializer = serializer
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _version_key(self) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.namespace}:version"
+
+    def _keys(self, keys: List[str]) -> List[str]:
+        version = self.backend.counter(self._version_key())
+        return [f"{CACHE_KEY_PREFIX}:{self.namespace}:{version}:{key}" for key in keys]
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def get_many(self, keys: List[str]) -> List[Any]:
+        # Backend failures degrade to misses; a cache must never fail a request.
+        try:
+            raw = self.backend.get_many(self._keys(keys))
+            values = [
+                self.serializer.loads(data) if data is not None else None
+                for data in raw
+            ]
+        except Exception as e:
+            logger.error(f"Cache {self.namespace} lookup failed: {str(e)}")
+            self._count(errors=1, misses=len(keys))
+            return [None] * len(keys)
+        hits = sum(value is not None for value in values)
+        self._count(hits=hits, misses=len(keys) - hits)
+        for value in values:
+            record_cache_lookup(self.namespace, value is not None)
+        return values
+
+    def get(self, key: str) -> Any:
+        return self.get_many([key])[0]
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if not items:
+            return
+        try:
+            keys = self._keys(list(items))
+            self.backend.set_many(
+                {
+                    key: self.serializer.dumps(value)
+                    for key, value in zip(keys, items.values())
+                },
+                ttl if ttl is not None else self.ttl,
+            )
+            self._count(sets=len(items))
+        except Exception as e:
+            logger.error(f"Cache {self.namespace} store failed: {str(e)}")
+            self._count(errors=1)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set_many({key: value}, ttl)
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self._keys([key])[0])
+        except Exception as e:
+            logger.error(f"Cache {self.namespace} delete failed: {str(e)}")
+            self._count(errors=1)
+
+    def _generation_key(self, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.namespace}:generation:{key}"
+
+    def generation(self, key: str) -> Optional[int]:
+        # A per-key counter for conditional sets. Read it before loading the
+        # value, store the value with it, and trust a cached value only while
+        # the counter still matches; writers bump it after they commit.
+        try:
+            return self.backend.counter(self._generation_key(key))
+        except Exception as e:
+            logger.error(f"Cache {self.namespace} generation lookup failed: {str(e)}")
+            self._count(errors=1)
+            return None
+
+    def bump_generation(self, key: str):
+        try:
+            self.backend.incr(self._generation_key(key))
+        except Exception as e:
+            logger.error(f"Cache {self.namespace} generation bump failed: {str(e)}")
+            self._count(errors=1)
+
+    def get_or_set(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self) -> Optional[int]:
+        try:
+            version = self.backend.incr(self._version_key())
+            logger.info(f"Invalidated cache {self.namespace} (version {version})")
+            return version
+        except Exception as e:
+            logger.error(f"Cache {self.namespace} invalidation failed: {str(e)}")
+            self._count(errors=1)
+            return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+_caches: Dict[str, Cache] = {}
+
+
+def create_backend(name: str = CACHE_BACKEND) -> CacheBackend:
+    if name == "lru":
+        return LRUCacheBackend()
+    if name == "sqlite":
+        return SQLiteCacheBackend()
+    if name == "redis":
+        return RedisCacheBackend()
+    raise ValueError(
+        f"Unknown CACHE_BACKEND {name!r}; expected one of {', '.join(CACHE_BACKENDS)}"
+    )
+
+
+def get_backend() -> CacheBackend:
+    # One backend per process, shared by every namespace.
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+            logger.info(f"Using {_backend.name} cache backend")
+        return _backend
+
+
+def get_cache(
+    namespace: str, ttl: Optional[float] = CACHE_DEFAULT_TTL, serializer=JsonSerializer
+) -> Cache:
+    with _backend_lock:
+        cache = _caches.get(namespace)
+    if cache is None:
+        cache = Cache(get_backend(), namespace, ttl, serializer)
+        with _backend_lock:
+            cache = _caches.setdefault(namespace, cache)
+    return cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    backend = get_backend()
+    try:
+        size = backend.size()
+    except Exception as e:
+        logger.error(f"Cache size lookup failed: {str(e)}")
+        size = None
+    with _backend_lock:
+        caches = dict(_caches)
+    return {
+        "backend": backend.name,
+        "entries": size,
+        "namespaces": {
+            namespace: cache.snapshot() for namespace, cache in caches.items()
+        },
+    }
@@ -0,0 +1,146 @@
+import gzip
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Optional
+from flask import Flask, Response, request
+from utils.http_cache import encoded_etag
+from utils.metrics import Counter, registry
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/markdown",
+}
+
+
+class PayloadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(
+            lambda: {
+                "responses": 0,
+                "compressed_responses": 0,
+                "raw_bytes": 0,
+                "sent_bytes": 0,
+            }
+        )
+
+    def record(self, endpoint: str, raw_bytes: int, sent_bytes: int, compressed: bool):
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats["responses"] += 1
+            stats["raw_bytes"] += raw_bytes
+            stats["sent_bytes"] += sent_bytes
+            if compressed:
+                stats["compressed_responses"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+        for stats in endpoints.values():
+            stats["compression_ratio"] = (
+                round(stats["sent_bytes"] / stats["raw_bytes"], 4)
+                if stats["raw_bytes"]
+                else None
+            )
+        return endpoints
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+payload_stats = PayloadStats()
+
+
+def _payload_metrics():
+    raw = Counter(
+        "http_response_raw_bytes_total",
+        "Response body bytes before compression, by endpoint",
+        ("endpoint",),
+    )
+    sent = Counter(
+        "http_response_sent_bytes_total",
+        "Response body bytes after compression, by endpoint",
+        ("endpoint",),
+    )
+    for endpoint, stats in payload_stats.snapshot().items():
+        raw.inc(stats["raw_bytes"], endpoint=endpoint)
+        sent.inc(stats["sent_bytes"], endpoint=endpoint)
+    return [raw, sent]
+
+
+registry.add_collector(_payload_metrics)
+
+
+def negotiate_encoding() -> Optional[str]:
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(supported)
+
+
+def _compress(data: bytes, encoding: str, config) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=config["BROTLI_QUALITY"])
+    return gzip.compress(data, compresslevel=config["GZIP_LEVEL"])
+
+
+def _is_compressible(response: Response) -> bool:
+    return (
+        200 <= response.status_code < 300
+        and response.status_code not in (204, 206)
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def init_compression(app: Flask):
+    config = app.config
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        if not config["COMPRESSION_ENABLED"] or request.method == "HEAD":
+            return response
+
+        encoding = negotiate_encoding()
+        etag, weak = response.get_etag()
+
+        if response.status_code == 304:
+            # Echo the encoded variant the client revalidated against.
+            if (
+                encoding
+                and etag
+                and request.if_none_match.contains_weak(encoded_etag(etag, encoding))
+            ):
+                response.set_etag(encoded_etag(etag, encoding), weak)
+            return response
+
+        if not _is_compressible(response):
+            return response
+
+        endpoint = request.endpoint or "unmatched"
+        raw = response.get_data()
+        if len(raw) < config["COMPRESSION_MIN_SIZE"]:
+            payload_stats.record(endpoint, len(raw), len(raw), compressed=False)
+            return response
+
+        response.vary.add("Accept-Encoding")
+        compressed = _compress(raw, encoding, config) if encoding else raw
+        if len(compressed) >= len(raw):
+            payload_stats.record(endpoint, len(raw), len(raw), compressed=False)
+            return response
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # A strong ETag must differ between encodings of the same resource.
+            response.set_etag(encoded_etag(etag, encoding), weak)
+        payload_stats.record(endpoint, len(raw), len(compressed), compressed=True)
+        return response
@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+
+class DebouncedRunner:
+    # Runs run(key) once a key has gone `delay` seconds without being
+    # rescheduled, on a pool that caps how many runs overlap.
+    def __init__(
+        self,
+        run: Callable[[Hashable], Any],
+        delay: float,
+        concurrency: int,
+        name: str,
+    ):
+        self.run = run
+        self.delay = delay
+        self.name = name
+        # Key -> monotonic time its run is due.
+        self._pending: Dict[Hashable, float] = {}
+        self._condition = threading.Condition()
+        self._scheduler = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix=name
+        )
+
+    def schedule(self, key: Hashable):
+        with self._condition:
+            self._pending[key] = time.monotonic() + self.delay
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(
+                    target=self._run_scheduler,
+                    name=f"{self.name}-scheduler",
+                    daemon=True,
+                )
+                self._scheduler.start()
+            self._condition.notify()
+
+    def cancel(self, key: Hashable):
+        with self._condition:
+            self._pending.pop(key, None)
+
+    def _run_scheduler(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    due = [
+                        key for key, due_at in self._pending.items() if due_at <= now
+                    ]
+                    if due:
+                        break
+                    timeout = (
+                        min(self._pending.values()) - now if self._pending else None
+                    )
+                    self._condition.wait(timeout)
+                for key in due:
+                    del self._pending[key]
+            for key in due:
+                self._executor.submit(self.run, key)
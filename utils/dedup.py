@@ -0,0 +1,101 @@
+import hashlib
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain.schema import Document
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(_TOKEN_PATTERN.findall(text.lower()))
+
+
+def _feature_hash(feature: str) -> bytes:
+    return hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+
+
+def simhash(normalized_text: str) -> int:
+    tokens = normalized_text.split()
+    if len(tokens) > SHINGLE_SIZE:
+        features = [
+            " ".join(tokens[i : i + SHINGLE_SIZE])
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        ]
+    else:
+        features = [normalized_text]
+
+    hashes = np.frombuffer(
+        b"".join(_feature_hash(feature) for feature in features), dtype=np.uint8
+    ).reshape(len(features), SIMHASH_BITS // 8)
+    # Each bit votes +1/-1 per feature; the fingerprint keeps the majority.
+    bit_counts = np.unpackbits(hashes, axis=1).sum(axis=0, dtype=np.int64)
+    majority = (2 * bit_counts > len(features)).astype(np.uint8)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+class NearDuplicateIndex:
+    # Splitting fingerprints into max_distance + 1 bands guarantees (pigeonhole)
+    # that any fingerprint within max_distance bits shares at least one band.
+    def __init__(self, max_distance: int = 6):
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.band_count
+        self._bands: List[Dict[int, List[int]]] = [{} for _ in range(self.band_count)]
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [
+            fingerprint >> (band * self.band_bits) & mask
+            for band in range(self.band_count)
+        ]
+
+    def contains_near(self, fingerprint: int) -> bool:
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            for candidate in self._bands[band].get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, fingerprint: int):
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            self._bands[band].setdefault(key, []).append(fingerprint)
+
+
+def deduplicate_documents(
+    documents: List[Document], max_distance: int = 6
+) -> Tuple[List[Document], Dict[str, int]]:
+    seen_exact = set()
+    near_index = NearDuplicateIndex(max_distance) if max_distance >= 0 else None
+    kept = []
+    stats = {
+        "input_chunks": len(documents),
+        "empty_chunks": 0,
+        "exact_duplicates": 0,
+        "near_duplicates": 0,
+    }
+
+    for document in documents:
+        normalized = normalize_text(document.page_content)
+        if not normalized:
+            stats["empty_chunks"] += 1
+            continue
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        if digest in seen_exact:
+            stats["exact_duplicates"] += 1
+            continue
+        seen_exact.add(digest)
+
+        if near_index is not None:
+            fingerprint = simhash(normalized)
+            if near_index.contains_near(fingerprint):
+                stats["near_duplicates"] += 1
+                continue
+            near_index.add(fingerprint)
+        kept.append(document)
+
+    stats["kept_chunks"] = len(kept)
+    stats["dropped_chunks"] = len(documents) - len(kept)
+    return kept, stats
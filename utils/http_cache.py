@@ -0,0 +1,43 @@
+import hashlib
+from typing import Optional
+from flask import request, make_response, Response
+from utils.metrics import record_cache_lookup
+
+# Content codings applied by utils.compression; each gets its own strong ETag.
+CONTENT_ENCODINGS = ("br", "gzip")
+
+
+def compute_etag(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    return f"{etag}-{encoding}"
+
+
+def is_not_modified(etag: str) -> bool:
+    # If-None-Match uses weak comparison, so tags weakened by a proxy still match.
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    matched = if_none_match.contains_weak(etag) or any(
+        if_none_match.contains_weak(encoded_etag(etag, encoding))
+        for encoding in CONTENT_ENCODINGS
+    )
+    record_cache_lookup("http_etag", matched)
+    return matched
+
+
+def not_modified_response(etag: str, cache_control: Optional[str] = None) -> Response:
+    response = make_response("", 304)
+    return apply_cache_headers(response, etag, cache_control)
+
+
+def apply_cache_headers(
+    response: Response, etag: str, cache_control: Optional[str] = None
+) -> Response:
+    response.set_etag(etag)
+    if cache_control:
+        response.headers["Cache-Control"] = cache_control
+    return response
@@ -1,33 +1,106 @@
+import atexit
+import itertools
+import json
 import logging
+import os
+import queue
+import re
 import sys
-from logging.handlers import RotatingFileHandler
+import uuid
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from pathlib import Path
-import os
 from datetime import datetime
+from dotenv import load_dotenv
+from flask import Flask, g, has_request_context, request
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_DEBUG_SAMPLE_EVERY = max(int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", 1)), 1)
+
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+def get_request_id() -> str:
+    if has_request_context():
+        return g.get("request_id", "-")
+    return "-"
+
+
+class RequestContextFilter(logging.Filter):
+    # Runs in the calling thread, before the record is handed to the queue.
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_id()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    def __init__(self, sample_every: int):
+        super().__init__()
+        self.sample_every = sample_every
+        self._counters = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.sample_every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.sample_every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
 
 
 class CustomLogger:
     def __init__(self, name: str = "TrackML"):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(LOG_LEVEL)
+        self.listener = None
 
         self.log_dir = Path("logs")
         self.log_dir.mkdir(exist_ok=True)
 
         self._setup_formatters()
-        self._setup_handlers()
+        if not self.logger.handlers:
+            self._setup_handlers()
 
     def _setup_formatters(self):
-        self.console_formatter = logging.Formatter("%(levelname)s - %(message)s")
+        if LOG_FORMAT == "json":
+            self.console_formatter = JsonFormatter()
+            self.file_formatter = JsonFormatter()
+            return
+
+        self.console_formatter = logging.Formatter(
+            "%(levelname)s - [%(request_id)s] - %(message)s"
+        )
 
         self.file_formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s",
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - [%(filename)s:%(lineno)d] - %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S",
         )
 
     def _setup_handlers(self):
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
+        console_handler.setLevel(LOG_CONSOLE_LEVEL)
         console_handler.setFormatter(self.console_formatter)
 
         current_date = datetime.now().strftime("%Y-%m-%d")
@@ -37,29 +110,71 @@ class CustomLogger:
             backupCount=5,
             encoding="utf-8",
         )
-        file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(self.file_formatter)
 
-        self.logger.addHandler(console_handler)
-        self.logger.addHandler(file_handler)
+        self.logger.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_EVERY))
+
+        if not LOG_ASYNC:
+            for handler in (console_handler, file_handler):
+                handler.addFilter(RequestContextFilter())
+                self.logger.addHandler(handler)
+            return
+
+        # Request threads only enqueue records; a listener thread does the I/O.
+        queue_handler = QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(RequestContextFilter())
+        self.logger.addHandler(queue_handler)
+        self.listener = QueueListener(
+            queue_handler.queue,
+            console_handler,
+            file_handler,
+            respect_handler_level=True,
+        )
+        self.listener.start()
+        atexit.register(self.listener.stop)
 
+    # stacklevel=2 attributes records to the caller instead of this wrapper.
     def debug(self, message: str, *args, **kwargs):
-        self.logger.debug(message, *args, **kwargs)
+        self.logger.debug(message, *args, stacklevel=2, **kwargs)
 
     def info(self, message: str, *args, **kwargs):
-        self.logger.info(message, *args, **kwargs)
+        self.logger.info(message, *args, stacklevel=2, **kwargs)
 
     def warning(self, message: str, *args, **kwargs):
-        self.logger.warning(message, *args, **kwargs)
+        self.logger.warning(message, *args, stacklevel=2, **kwargs)
 
     def error(self, message: str, *args, **kwargs):
-        self.logger.error(message, *args, **kwargs)
+        self.logger.error(message, *args, stacklevel=2, **kwargs)
 
     def critical(self, message: str, *args, **kwargs):
-        self.logger.critical(message, *args, **kwargs)
+        self.logger.critical(message, *args, stacklevel=2, **kwargs)
 
     def exception(self, message: str, *args, exc_info=True, **kwargs):
-        self.logger.exception(message, *args, exc_info=exc_info, **kwargs)
+        self.logger.exception(message, *args, exc_info=exc_info, stacklevel=2, **kwargs)
+
+
+def init_request_context(app: Flask):
+    @app.before_request
+    def assign_request_id():
+        request_id = request.headers.get("X-Request-ID", "")
+        if not REQUEST_ID_PATTERN.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        g.request_id = request_id
+
+    @app.after_request
+    def echo_request_id(response):
+        if "request_id" in g:
+            response.headers["X-Request-ID"] = g.request_id
+            # Routes with their own cross_origin settings expose nothing by
+            # default; cross-origin clients still need to read the id.
+            if "Access-Control-Allow-Origin" in response.headers:
+                exposed = response.headers.get("Access-Control-Expose-Headers", "")
+                names = [name.strip() for name in exposed.split(",") if name.strip()]
+                if "x-request-id" not in (name.lower() for name in names):
+                    response.headers["Access-Control-Expose-Headers"] = ", ".join(
+                        names + ["X-Request-ID"]
+                    )
+        return response
 
 
 logger = CustomLogger()
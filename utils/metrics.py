@@ -0,0 +1,320 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from flask import Flask, g, request
+from sqlalchemy import event
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, *args, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts followed by the overflow bucket, sum and count.
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 3))
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]):
+        # Collectors build metrics from other state at scrape time.
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total",
+    "HTTP requests handled, by route and status",
+    ("method", "route", "status"),
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds, by route",
+    ("method", "route"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+)
+db_queries_total = registry.counter(
+    "db_queries_total", "SQL statements executed, by operation", ("operation",)
+)
+db_query_errors_total = registry.counter(
+    "db_query_errors_total", "SQL statements that raised, by operation", ("operation",)
+)
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency in seconds, by operation",
+    ("operation",),
+)
+external_calls_total = registry.counter(
+    "external_calls_total",
+    "Calls to LLM, embedding and HTTP providers",
+    ("provider", "operation"),
+)
+external_call_errors_total = registry.counter(
+    "external_call_errors_total",
+    "Failed calls to LLM, embedding and HTTP providers",
+    ("provider", "operation"),
+)
+external_call_duration_seconds = registry.histogram(
+    "external_call_duration_seconds",
+    "Latency of calls to LLM, embedding and HTTP providers in seconds",
+    ("provider", "operation"),
+)
+cache_requests_total = registry.counter(
+    "cache_requests_total", "Cache lookups, by cache and result", ("cache", "result")
+)
+
+
+def _cache_hit_ratios() -> Iterable[_Metric]:
+    ratios = Gauge("cache_hit_ratio", "Fraction of cache lookups that hit", ("cache",))
+    values = cache_requests_total.snapshot()
+    for cache in {cache for cache, _ in values}:
+        hits = values.get((cache, "hit"), 0)
+        total = hits + values.get((cache, "miss"), 0)
+        if total:
+            ratios.set(hits / total, cache=cache)
+    return [ratios]
+
+
+registry.add_collector(_cache_hit_ratios)
+
+
+# Called as listener(provider, operation, seconds, failed) after each tracked
+# call; empty unless a feature such as request profiling registers one.
+_call_listeners: List[Callable[[str, str, float, bool], None]] = []
+
+
+def add_call_listener(listener: Callable[[str, str, float, bool], None]):
+    _call_listeners.append(listener)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def track_call(provider: str, operation: str):
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        external_call_errors_total.inc(provider=provider, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        external_calls_total.inc(provider=provider, operation=operation)
+        external_call_duration_seconds.observe(
+            elapsed, provider=provider, operation=operation
+        )
+        for listener in _call_listeners:
+            listener(provider, operation, elapsed, failed)
+
+
+def _statement_operation(statement: str) -> str:
+    parts = statement.lstrip().split(None, 1)
+    return parts[0].upper() if parts else "UNKNOWN"
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start = conn.info["query_start_times"].pop()
+        operation = _statement_operation(statement)
+        db_queries_total.inc(operation=operation)
+        db_query_duration_seconds.observe(
+            time.perf_counter() - start, operation=operation
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        start_times = exception_context.connection.info.get("query_start_times")
+        if start_times:
+            start_times.pop()
+        operation = _statement_operation(exception_context.statement or "")
+        db_queries_total.inc(operation=operation)
+        db_query_errors_total.inc(operation=operation)
+
+
+def _route_label() -> str:
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def init_metrics(app: Flask):
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start_time = time.perf_counter()
+        http_requests_in_flight.inc()
+
+    @app.after_request
+    def record_response_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request_metrics(exception: Optional[BaseException] = None):
+        start = g.pop("metrics_start_time", None)
+        if start is None:
+            return
+        http_requests_in_flight.dec()
+        status = g.pop("metrics_status", 500 if exception else 200)
+        route = _route_label()
+        http_requests_total.inc(method=request.method, route=route, status=status)
+        http_request_duration_seconds.observe(
+            time.perf_counter() - start, method=request.method, route=route
+        )
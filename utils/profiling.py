@@ -0,0 +1,252 @@
+import cProfile
+import contextvars
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from flask import Flask, g, request
+from sqlalchemy import event
+from utils.logging import get_request_id, logger
+from utils.metrics import add_call_listener
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SKIPPED_HEADER = "X-Profile-Skipped"
+REPORT_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+MAX_SQL_STATEMENTS = 200
+MAX_STATEMENT_CHARS = 2000
+
+_active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = (
+    contextvars.ContextVar("active_profile", default=None)
+)
+# cProfile allows one active profiler per interpreter, so a request arriving
+# while another is profiled runs unprofiled.
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self, trigger: str):
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.started_at = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.sql_statements: List[Dict[str, Any]] = []
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.external_calls: List[Dict[str, Any]] = []
+        # External calls can finish on executor threads that copied the context.
+        self._lock = threading.Lock()
+
+    def record_sql(self, statement: str, seconds: float):
+        with self._lock:
+            self.sql_count += 1
+            self.sql_seconds += seconds
+            if len(self.sql_statements) < MAX_SQL_STATEMENTS:
+                self.sql_statements.append(
+                    {
+                        "statement": statement[:MAX_STATEMENT_CHARS],
+                        "duration_ms": round(seconds * 1000, 3),
+                    }
+                )
+
+    def record_call(self, provider: str, operation: str, seconds: float, failed: bool):
+        with self._lock:
+            self.external_calls.append(
+                {
+                    "provider": provider,
+                    "operation": operation,
+                    "duration_ms": round(seconds * 1000, 3),
+                    "failed": failed,
+                }
+            )
+
+    def report(self, status: Optional[int], top_functions: int) -> Dict[str, Any]:
+        stats_output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stats_output)
+        stats.sort_stats("cumulative").print_stats(top_functions)
+        return {
+            "id": self.id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "request_id": get_request_id(),
+            "trigger": self.trigger,
+            "method": request.method,
+            "path": request.path,
+            "route": request.url_rule.rule if request.url_rule else None,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self.started_at) * 1000, 3),
+            "sql": {
+                "count": self.sql_count,
+                "total_ms": round(self.sql_seconds * 1000, 3),
+                "statements": self.sql_statements,
+            },
+            "external_calls": self.external_calls,
+            "profile": stats_output.getvalue(),
+        }
+
+
+class ProfileStore:
+    # Reports are files so any worker on the host can serve them.
+    def __init__(self, directory: str, max_reports: int):
+        self.directory = Path(directory)
+        self.max_reports = max_reports
+
+    def save(self, report: Dict[str, Any], profiler: cProfile.Profile):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(self.directory / f"{report['id']}.prof")
+        with open(self.directory / f"{report['id']}.json", "w") as f:
+            json.dump(report, f)
+        self._prune()
+
+    def _prune(self):
+        reports = sorted(self.directory.glob("*.json"), key=os.path.getmtime)
+        for path in reports[: max(len(reports) - self.max_reports, 0)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".prof").unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        summaries = []
+        for path in sorted(
+            self.directory.glob("*.json"), key=os.path.getmtime, reverse=True
+        ):
+            report = self.get(path.stem)
+            if report:
+                summaries.append(
+                    {
+                        key: report[key]
+                        for key in (
+                            "id",
+                            "created_at",
+                            "method",
+                            "path",
+                            "status",
+                            "duration_ms",
+                        )
+                    }
+                )
+        return summaries
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        if not REPORT_ID_PATTERN.fullmatch(report_id):
+            return None
+        try:
+            with open(self.directory / f"{report_id}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, report_id: str) -> Optional[Path]:
+        if not REPORT_ID_PATTERN.fullmatch(report_id):
+            return None
+        path = self.directory / f"{report_id}.prof"
+        return path if path.exists() else None
+
+
+def is_profiling_authorized(app: Flask) -> bool:
+    token = app.config["PROFILING_TOKEN"]
+    supplied = request.headers.get(PROFILE_TOKEN_HEADER)
+    return bool(token and supplied) and hmac.compare_digest(supplied, token)
+
+
+def _record_call(provider: str, operation: str, seconds: float, failed: bool):
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.record_call(provider, operation, seconds, failed)
+
+
+def _instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, many):
+        if _active_profile.get() is not None:
+            conn.info.setdefault("profile_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, many):
+        profile = _active_profile.get()
+        start_times = conn.info.get("profile_start_times")
+        if profile is not None and start_times:
+            profile.record_sql(statement, time.perf_counter() - start_times.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def discard_statement(exception_context):
+        start_times = exception_context.connection.info.get("profile_start_times")
+        if start_times:
+            start_times.pop()
+
+
+def init_profiling(app: Flask, engine):
+    # Nothing is registered unless enabled, so disabled profiling costs nothing.
+    if not app.config["PROFILING_ENABLED"]:
+        return
+    if not app.config["PROFILING_TOKEN"] and not app.config["PROFILING_SAMPLE_RATE"]:
+        logger.warning(
+            "Profiling is enabled without PROFILING_TOKEN or PROFILING_SAMPLE_RATE"
+        )
+
+    store = ProfileStore(
+        app.config["PROFILING_REPORT_DIR"], app.config["PROFILING_MAX_REPORTS"]
+    )
+    app.extensions["profile_store"] = store
+    sample_rate = app.config["PROFILING_SAMPLE_RATE"]
+    top_functions = app.config["PROFILING_TOP_FUNCTIONS"]
+    add_call_listener(_record_call)
+    _instrument_engine(engine)
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith("/profiles"):
+            return
+        if is_profiling_authorized(app):
+            trigger = "header"
+        elif sample_rate and random.random() < sample_rate:
+            trigger = "sample"
+        else:
+            return
+        if not _profiler_lock.acquire(blocking=False):
+            logger.debug("Skipping profile, another request is being profiled")
+            if trigger == "header":
+                g.profile_skipped = True
+            return
+        profile = RequestProfile(trigger)
+        g.profile = profile
+        g.profile_token = _active_profile.set(profile)
+        profile.profiler.enable()
+
+    @app.after_request
+    def expose_profile_id(response):
+        profile = g.get("profile")
+        if profile is not None:
+            response.headers[PROFILE_ID_HEADER] = profile.id
+            g.profile_status = response.status_code
+        elif g.get("profile_skipped"):
+            response.headers[PROFILE_SKIPPED_HEADER] = "busy"
+        return response
+
+    @app.teardown_request
+    def finish_profile(exception=None):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return
+        try:
+            profile.profiler.disable()
+            _active_profile.reset(g.pop("profile_token"))
+            report = profile.report(
+                g.pop("profile_status", 500 if exception else None), top_functions
+            )
+            store.save(report, profile.profiler)
+            logger.info(
+                f"Saved profile {profile.id} for {request.method} {request.path} "
+                f"({report['duration_ms']} ms)"
+            )
+        except Exception as e:
+            logger.error(f"Failed to save profile {profile.id}: {str(e)}")
+        finally:
+            _profiler_lock.release()
@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+from flask import Flask, Request, current_app, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from utils.logging import logger
+from utils.typing import ApiResponseHandler
+
+# A path for uploads spooled to disk, (filename, bytes) for in-memory ones.
+DocumentSource = Union[str, Tuple[str, bytes]]
+
+
+class SpooledUpload:
+    # Werkzeug's multipart parser writes the upload into this as it streams in:
+    # it is hashed on the fly, kept in memory up to max_memory bytes, and moved
+    # to a file in this request's private temp directory beyond that.
+    def __init__(
+        self,
+        filename: Optional[str],
+        make_directory: Callable[[], str],
+        max_memory: int,
+    ):
+        self.filename = secure_filename(filename or "") or "upload"
+        self.size = 0
+        self.path = None
+        self._make_directory = make_directory
+        self._max_memory = max_memory
+        self._digest = hashlib.sha256()
+        self._file = io.BytesIO()
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        if self.path is None and self.size > self._max_memory:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self):
+        self.path = os.path.join(self._make_directory(), self.filename)
+        disk_file = open(self.path, "w+b")
+        disk_file.write(self._file.getvalue())
+        self._file = disk_file
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    def source(self) -> DocumentSource:
+        if self.in_memory:
+            return self.filename, self._file.getvalue()
+        self._file.flush()
+        return self.path
+
+    def __getattr__(self, name):
+        # read/seek/tell/close etc. go to the current buffer or file.
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._uploads: List[SpooledUpload] = []
+        self._upload_root = None
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> SpooledUpload:
+        upload = SpooledUpload(
+            filename,
+            self._make_upload_directory,
+            current_app.config["UPLOAD_SPOOL_MAX_MEMORY"],
+        )
+        self._uploads.append(upload)
+        return upload
+
+    def _make_upload_directory(self) -> str:
+        # One directory per upload, so equal filenames never collide.
+        if self._upload_root is None:
+            self._upload_root = tempfile.mkdtemp(prefix="trackml-upload-")
+        return tempfile.mkdtemp(dir=self._upload_root)
+
+    def cleanup_uploads(self):
+        for upload in self._uploads:
+            try:
+                upload.close()
+            except Exception as e:
+                logger.warning(f"Failed to close upload {upload.filename}: {str(e)}")
+        self._uploads = []
+        if self._upload_root is not None:
+            shutil.rmtree(self._upload_root, ignore_errors=True)
+            self._upload_root = None
+
+
+@contextmanager
+def spooled_uploads(field: str = "files") -> Iterator[List[SpooledUpload]]:
+    try:
+        yield [
+            file.stream
+            for file in request.files.getlist(field)
+            if file and file.filename
+        ]
+    finally:
+        request.cleanup_uploads()
+
+
+def init_uploads(app: Flask):
+    app.request_class = UploadRequest
+
+    @app.teardown_request
+    def cleanup_uploads(exception=None):
+        # Safety net for requests that never reached spooled_uploads().
+        request.cleanup_uploads()
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def upload_too_large(error):
+        limit_mb = app.config["MAX_CONTENT_LENGTH"] / (1024 * 1024)
+        return jsonify(
+            ApiResponseHandler.error(
+                f"Request body exceeds the {limit_mb:g} MB upload limit", 413
+            )
+        ), 413
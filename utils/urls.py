@@ -0,0 +1,55 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from.
+TRACKING_PARAMETERS = {
+    "fbclid",
+    "gclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "si",
+}
+TRACKING_PREFIXES = ("utm_",)
+# Hosts that serve the same pages as another host.
+HOST_ALIASES = {
+    "hf.co": "huggingface.co",
+    "export.arxiv.org": "arxiv.org",
+    "mobile.twitter.com": "x.com",
+    "twitter.com": "x.com",
+}
+HOST_PREFIXES = ("www.", "m.")
+_ARXIV_PAPER = re.compile(r"^/(?:abs|pdf)/(\d{4}\.\d{4,5})(?:v\d+)?(?:\.pdf)?/?$")
+
+
+def canonicalize_url(url: str) -> str:
+    # One spelling per page: https, lowercase host without www./m. or default
+    # ports, mirrors mapped to their main host, no fragment or tracking
+    # parameters, sorted query and no trailing slash. arXiv PDFs and versions
+    # map to the abstract page.
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    host = HOST_ALIASES.get(host, host)
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if host == "arxiv.org":
+        paper = _ARXIV_PAPER.match(path)
+        if paper:
+            path = f"/abs/{paper.group(1)}"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMETERS
+        and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
@@ -0,0 +1,114 @@
+import os
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPRESENTATIONS = ("float32", "int8")
+# int8 searches rescore this many candidates per result at full precision.
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", 4))
+# Rows converted from int8 at a time while scoring.
+SCORE_BLOCK_SIZE = 4096
+
+
+def normalized(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Symmetric per-row quantization: row ~= codes * scale.
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _top_indices(scores: np.ndarray, count: int) -> np.ndarray:
+    count = min(count, len(scores))
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, count - 1)[:count]
+    return top[np.argsort(-scores[top])]
+
+
+class VectorIndex:
+    # Unit-length vectors in one contiguous array, as float32 or as int8 codes
+    # with a float32 scale per row (about a quarter of the size). int8 results
+    # are rescored at full precision from `vectors` when it is memory-mapped,
+    # otherwise from `fetch`, so only codes and scales stay resident.
+    def __init__(
+        self,
+        ids: np.ndarray,
+        vectors: Optional[np.ndarray],
+        representation: str = "float32",
+        codes: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        fetch: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.representation = representation
+        self.fetch = fetch
+        self.codes = self.scales = None
+        if representation == "int8":
+            if codes is None:
+                codes, scales = quantize_int8(vectors)
+            self.codes, self.scales = codes, scales
+            if not isinstance(vectors, np.memmap):
+                vectors = None
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        # Bytes held in this process; memory-mapped arrays live in the page
+        # cache, shared with every other worker mapping the same file.
+        arrays = [self.ids, self.vectors, self.codes, self.scales]
+        return sum(
+            array.nbytes
+            for array in arrays
+            if array is not None and not isinstance(array, np.memmap)
+        )
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        if self.representation == "float32":
+            return self.vectors @ query
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_SIZE):
+            block = slice(start, start + SCORE_BLOCK_SIZE)
+            scores[block] = self.codes[block].astype(np.float32) @ query
+        return scores * self.scales
+
+    def _full_vectors(self, positions: np.ndarray) -> Optional[np.ndarray]:
+        if self.vectors is not None:
+            return np.asarray(self.vectors[positions])
+        if self.fetch is not None:
+            return self.fetch(self.ids[positions])
+        return None
+
+    def search(
+        self, query, k: int, rescore_factor: int = VECTOR_RESCORE_FACTOR
+    ) -> List[Tuple[int, float]]:
+        if not len(self.ids):
+            return []
+        query = normalized(query)
+        scores = self.scores(query)
+        if self.representation == "int8" and rescore_factor > 1:
+            candidates = _top_indices(scores, k * rescore_factor)
+            full = self._full_vectors(candidates)
+            if full is not None:
+                # NaN rows (or no columns) are vectors fetch could not find.
+                exact = np.full(len(candidates), -np.inf, dtype=np.float32)
+                if full.size:
+                    exact = np.nan_to_num(full @ query, nan=-np.inf)
+                order = _top_indices(exact, k)
+                return [
+                    (int(self.ids[candidates[i]]), float(exact[i]))
+                    for i in order
+                    if np.isfinite(exact[i])
+                ]
+        return [(int(self.ids[i]), float(scores[i])) for i in _top_indices(scores, k)]